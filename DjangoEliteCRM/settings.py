@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'LeadTracker.middleware.ActivityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -130,10 +132,44 @@ AUTH_USER_MODEL = 'Custom_user.User'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Cache settings for typing indicator
+# Cache settings for typing indicator. 'shared' is read by every process (web
+# workers, background jobs, management commands) and holds the version
+# stamps, rollup totals, analytics snapshot and job progress of LeadTracker;
+# create its table with "python manage.py createcachetable"
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'leadtracker_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
 }
+
+# Seconds the cached analytics snapshot is served before a background refresh
+ANALYTICS_STALENESS_BUDGET = 300
+
+# Buffered user activity: seconds between UserActivity flushes, and the
+# longest gap between two requests that still counts as active time
+ACTIVITY_TRACKING = True
+ACTIVITY_FLUSH_INTERVAL = 60
+ACTIVITY_IDLE_TIMEOUT = 900
+
+# Clients older than this many days, or whose fields hold one of the closed
+# states ({field name: [values]}), are moved to the archive tables by the
+# archive_clients command
+LEADTRACKER_ARCHIVE_AFTER_DAYS = 365
+LEADTRACKER_ARCHIVE_CLOSED_STATES = {}
+
+# manage.py test: keep test data out of anything the running site reads
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+if TESTING:
+    ACTIVITY_TRACKING = False
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'leadtracker-shared-tests',
+    }
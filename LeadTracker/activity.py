@@ -0,0 +1,139 @@
+"""
+Buffered per-user activity tracking.
+
+ActivityMiddleware reports every authenticated request and the Client
+handlers report every committed new lead to the process-local recorder
+below. It only adds to in-memory counters; every ACTIVITY_FLUSH_INTERVAL
+seconds the middleware hands a flush to a background job, which writes all
+of them to UserActivity with a single bulk upsert on (user, date).
+Processes without the middleware (management commands) flush explicitly.
+Set ACTIVITY_TRACKING = False to turn recording off (the tests do).
+
+Active time is the sum of gaps between a user's consecutive requests that
+are shorter than ACTIVITY_IDLE_TIMEOUT.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import localdate
+
+from Custom_user.models import User
+
+from .models import UserActivity
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_HUNDREDTH_HOUR = 36
+
+
+class ActivityRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (user_id, date) -> [new records, active seconds]
+        self._pending = defaultdict(lambda: [0, 0.0])
+        self._last_seen = {}
+        self._last_flush = time.monotonic()
+        self._flushing = False
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'ACTIVITY_TRACKING', True)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 60)
+
+    @property
+    def idle_timeout(self):
+        return getattr(settings, 'ACTIVITY_IDLE_TIMEOUT', 900)
+
+    def touch(self, user_id):
+        """Record a request by user_id, crediting the time since their previous one."""
+        if not self.enabled:
+            return
+        current = time.monotonic()
+        with self._lock:
+            previous = self._last_seen.get(user_id)
+            self._last_seen[user_id] = current
+            if previous is not None and current - previous <= self.idle_timeout:
+                self._pending[(user_id, localdate())][1] += current - previous
+
+    def add_records(self, user_id, day, count=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending[(user_id, day)][0] += count
+
+    def flush_due(self):
+        """True if a flush is due and nobody else is running one; claims it if so."""
+        with self._lock:
+            if self._flushing or time.monotonic() - self._last_flush < self.flush_interval:
+                return False
+            self._flushing = True
+            return True
+
+    def _take(self):
+        """Swap out the pending counters, keeping sub-resolution active time for later."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0.0])
+            self._last_flush = time.monotonic()
+        deltas, carry = {}, {}
+        for key, (records, seconds) in pending.items():
+            # active_hours has two decimals; keep the seconds that do not fill one for later
+            hundredths, carry[key] = divmod(seconds, SECONDS_PER_HUNDREDTH_HOUR)
+            if records or hundredths:
+                deltas[key] = (records, Decimal(int(hundredths)) / 100)
+        with self._lock:
+            for key, seconds in carry.items():
+                if seconds:
+                    self._pending[key][1] += seconds
+        return deltas
+
+    def _restore(self, deltas):
+        """Put back counters taken by a flush that failed, so the next flush writes them."""
+        with self._lock:
+            for key, (records, hours) in deltas.items():
+                self._pending[key][0] += records
+                self._pending[key][1] += float(hours * 100) * SECONDS_PER_HUNDREDTH_HOUR
+
+    def flush(self):
+        """Write the buffered counters to UserActivity in one bulk upsert."""
+        deltas = {}
+        try:
+            deltas = self._take()
+            # Users deleted since their activity was buffered
+            existing = set(User.objects.filter(id__in={user_id for user_id, _ in deltas}).values_list('id', flat=True))
+            deltas = {key: delta for key, delta in deltas.items() if key[0] in existing}
+            if not deltas:
+                return
+            with transaction.atomic():
+                UserActivity.objects.bulk_create(
+                    [UserActivity(user_id=user_id, date=day) for user_id, day in deltas],
+                    ignore_conflicts=True,
+                )
+                condition = Q()
+                for user_id, day in deltas:
+                    condition |= Q(user_id=user_id, date=day)
+                rows = list(UserActivity.objects.filter(condition).only('id', 'user_id', 'date'))
+                for row in rows:
+                    records, hours = deltas[(row.user_id, row.date)]
+                    row.record_count = F('record_count') + records
+                    row.active_hours = F('active_hours') + hours
+                UserActivity.objects.bulk_update(rows, ['record_count', 'active_hours'])
+        except Exception:
+            # The transaction rolled back, so nothing of these deltas was written
+            self._restore(deltas)
+            raise
+        finally:
+            with self._lock:
+                self._flushing = False
+
+
+recorder = ActivityRecorder()
+
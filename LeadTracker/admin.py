@@ -1,61 +1,152 @@
 from django.contrib import admin
-from .models import Client, FieldTemplate, ClientField, UserActivity
-from .forms import DynamicClientForm
-from django.utils.html import format_html
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from .models import TYPED_COLUMNS, Client, FieldTemplate, ClientField, UserActivity
+from .forms import DynamicClientForm, DynamicFieldsMixin, dynamic_field_values
+from .registry import field_templates as field_registry
+from django.utils.html import format_html, format_html_join
 from django import forms
 
+# Unfiltered changelists of tables larger than this show an estimated count
+ADMIN_EXACT_COUNT_LIMIT = 10000
+# Templates with more distinct values than this get no list filter
+ADMIN_FILTER_MAX_CHOICES = 50
+ADMIN_FILTER_CHOICES_TIMEOUT = 300
+
+def estimated_row_count(model):
+    """
+    Cheap row count estimate for model's table.
+
+    Uses the planner statistics on PostgreSQL and sqlite_stat1 (filled by
+    ANALYZE) on SQLite, falling back to the id range, which is an index
+    lookup at both ends.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+            if row and row[0] > 0:
+                return row[0]
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                # Every row of a table starts with its row count
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    bounds = model._default_manager.order_by().values_list('id', flat=True)
+    first, last = bounds.order_by('id').first(), bounds.order_by('-id').first()
+    return last - first + 1 if first is not None else 0
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the count of large unfiltered querysets instead of running COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model)
+            if estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+def field_choices(template):
+    """Distinct stored values of a template, or None when there are too many for a filter."""
+    key = f'admin:field_choices:{field_registry.version()}:{template.id}'
+    choices = cache.get(key)
+    if choices is None:
+        # Walks the (template, value) index
+        values = list(
+            ClientField.objects.filter(template_id=template.id).exclude(value='')
+            .order_by('value').values_list('value', flat=True).distinct()[:ADMIN_FILTER_MAX_CHOICES + 1]
+        )
+        choices = values if len(values) <= ADMIN_FILTER_MAX_CHOICES else []
+        cache.set(key, choices, ADMIN_FILTER_CHOICES_TIMEOUT)
+    return choices or None
+
+def template_list_filter(template):
+    """A SimpleListFilter class filtering clients by the value of one template."""
+    is_bool = template.field_type == FieldTemplate.TYPE_BOOL
+
+    class TemplateValueFilter(admin.SimpleListFilter):
+        title = template.name
+        parameter_name = f'field_{template.id}'
+
+        def lookups(self, request, model_admin):
+            if is_bool:
+                return [('true', 'Yes'), ('false', 'No')]
+            return [(value, value) for value in field_choices(template) or ()]
+
+        def queryset(self, request, queryset):
+            value = self.value()
+            if value is None:
+                return queryset
+            if is_bool:
+                return queryset.with_field(template.id, 'exact', value == 'true', column=TYPED_COLUMNS[template.field_type])
+            return queryset.with_field(template.id, 'exact', value)
+
+    return TemplateValueFilter
+
 class FieldTemplateInline(admin.TabularInline):
     model = FieldTemplate
     extra = 1
 
-class DynamicClientAdminForm(forms.ModelForm):
+class DynamicClientAdminForm(DynamicFieldsMixin, forms.ModelForm):
     class Meta:
         model = Client
         fields = ['created_by']
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-
-        if instance := kwargs.get('instance'):
-            for field in FieldTemplate.objects.all():
-                client_field = instance.fields.filter(template=field).first()
-                value = client_field.value if client_field else ''
-                self.fields[f'field_{field.id}'] = forms.CharField(label=field.name, required=False, initial=value)
-        else:
-            for field in FieldTemplate.objects.all():
-                self.fields[f'field_{field.id}'] = forms.CharField(label=field.name, required=False)
+        self.add_dynamic_fields()
 
     def save(self, commit=True):
         instance = super().save(commit=False)
         if commit:
             instance.save()
-            for field in FieldTemplate.objects.all():
-                value = self.cleaned_data.get(f'field_{field.id}', '')
-                client_field, created = ClientField.objects.get_or_create(client=instance, template=field)
-                client_field.value = value
-                client_field.save()
+            ClientField.objects.upsert_values(instance, dynamic_field_values(self.cleaned_data))
         return instance
 
 class ClientAdmin(admin.ModelAdmin):
     form = DynamicClientAdminForm
     list_display = ('id', 'created_by', 'creation_date', 'formatted_dynamic_fields')
-    list_filter = ('created_by',)
+    list_select_related = ('created_by',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_list_filter(self, request):
+        templates = [
+            template for template in field_registry.all()
+            if template.field_type == FieldTemplate.TYPE_BOOL or field_choices(template)
+        ]
+        return ('created_by', *(template_list_filter(template) for template in templates))
+
+    def get_queryset(self, request):
+        # One query for the values of the whole page; template names come from the registry
+        values = ClientField.objects.only('id', 'client_id', 'template_id', 'value')
+        return super().get_queryset(request).prefetch_related(Prefetch('fields', queryset=values))
 
     def save_model(self, request, obj, form, change):
-        super().save_model(request, obj, form, change)
-        for field in FieldTemplate.objects.all():
-            ClientField.objects.get_or_create(client=obj, template=field)
+        # The admin saves the form with commit=False, so the dynamic values are written here
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            ClientField.objects.upsert_values(obj, dynamic_field_values(form.cleaned_data))
 
     def formatted_dynamic_fields(self, obj):
-        fields = obj.fields.all()
-        if fields.exists():
+        values = {field.template_id: field.value for field in obj.fields.all()}
+        items = [(template.name, values[template.id]) for template in field_registry.all() if template.id in values]
+        if items:
             return format_html(
-                '<ul style="list-style: none; padding: 0;">' +
-                ''.join([f'<li><strong>{field.template.name}:</strong> {field.value}</li>' for field in fields]) +
-                '</ul>'
+                '<ul style="list-style: none; padding: 0;">{}</ul>',
+                format_html_join('', '<li><strong>{}:</strong> {}</li>', items),
             )
         return "No dynamic fields"
     formatted_dynamic_fields.short_description = 'Dynamic Fields'
 admin.site.register(UserActivity)
 admin.site.register(Client, ClientAdmin)
-admin.site.register(FieldTemplate)
\ No newline at end of file
+admin.site.register(FieldTemplate)
@@ -0,0 +1,206 @@
+"""
+Per-employee lead analytics computed with a fixed number of queries.
+
+employee_analytics() returns one entry per user with total records, last
+record, a 7-day daily series and a monthly series.
+
+The analytics page does not call it directly. It reads a snapshot that the
+update_analytics command (or a background refresh from analytics_view)
+stores in the shared cache, see build_snapshot().
+"""
+from datetime import date, datetime, time, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Avg, Count, Max, Min, OuterRef, Q, Subquery, Sum
+from django.utils.timezone import localdate, make_aware, now
+
+from Custom_user.models import User
+
+from . import rollups
+from .models import TYPED_COLUMNS, Client, ClientField, MonthlyClientCount
+from .registry import client_removal_version, shared_cache
+from .timeindex import creation_times
+
+DAILY_WINDOW_DAYS = 7
+
+SNAPSHOT_CACHE_KEY = 'analytics_data'
+# Kept until replaced: the view refreshes stale snapshots in the background,
+# so an old one is always better than building synchronously on a request
+SNAPSHOT_TIMEOUT = None
+
+
+def month_key(day):
+    return day.strftime('%Y-%m')
+
+
+def last_days(today, days=DAILY_WINDOW_DAYS):
+    return [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+
+
+def month_range(first, last):
+    """All 'YYYY-MM' keys from first to last (both dates), inclusive."""
+    months = []
+    current = first.replace(day=1)
+    while current <= last:
+        months.append(month_key(current))
+        current += relativedelta(months=1)
+    return months
+
+
+def employee_analytics(user_ids=None, today=None):
+    """
+    Compute analytics for every employee (or only user_ids) in a fixed number of queries.
+
+    The 7-day grid comes from the in-memory creation time index; monthly and
+    total counts come from the rollup tables. Neither grows with the number
+    of leads.
+    Each series uses the same axis for all employees (the last seven days,
+    and every month from the oldest record up to now), so the chart datasets
+    line up with each other.
+    """
+    today = today or localdate()
+    latest_client = Client.objects.filter(created_by=OuterRef('pk')).order_by('-id').values('id')[:1]
+    employees = User.objects.annotate(last_client_id=Subquery(latest_client)).order_by('id')
+    if user_ids is not None:
+        employees = employees.filter(id__in=user_ids)
+    employees = list(employees)
+    employee_ids = [employee.id for employee in employees]
+
+    last_records = Client.objects.select_related('created_by').in_bulk(
+        [employee.last_client_id for employee in employees if employee.last_client_id]
+    )
+
+    days = last_days(today)
+    edges = [make_aware(datetime.combine(day, time.min)) for day in days + [today + timedelta(days=1)]]
+    daily = creation_times.histogram(edges, user_ids=employee_ids)
+
+    monthly = {}
+    totals = {}
+    first_month = today
+    for (user_id, month), count in rollups.counts(MonthlyClientCount, date.min, user_ids=employee_ids, per_user=True).items():
+        if count:
+            first_month = min(first_month, month)
+        monthly[(user_id, month_key(month))] = count
+        totals[user_id] = totals.get(user_id, 0) + count
+    months = month_range(first_month, today)
+
+    current_time = now()
+    analytics_data = []
+    for employee in employees:
+        analytics_data.append({
+            'employee': employee,
+            'total_records': totals.get(employee.id, 0),
+            'last_record': last_records.get(employee.last_client_id),
+            'daily_counts': {str(day): int(count) for day, count in zip(days, daily[employee.id])},
+            'monthly_counts': {month: monthly.get((employee.id, month), 0) for month in months},
+            'active_time': current_time - employee.last_login if employee.last_login else None,
+        })
+    return analytics_data
+
+
+def field_statistics(template, user_ids=None, start=None, end=None):
+    """
+    Aggregate a typed template's values per employee in one grouped query.
+
+    Numbers get count/sum/avg/min/max, dates count/min/max and yes/no fields
+    count/yes/no. start and end restrict the clients by creation date. The
+    work happens in SQL on the typed columns, not on the stored text.
+    """
+    column = TYPED_COLUMNS[template.field_type]
+    aggregates = {'count': Count('id')}
+    if column == 'value_number':
+        aggregates.update(sum=Sum(column), avg=Avg(column), min=Min(column), max=Max(column))
+    elif column == 'value_date':
+        aggregates.update(min=Min(column), max=Max(column))
+    else:
+        aggregates.update(yes=Count('id', filter=Q(value_bool=True)), no=Count('id', filter=Q(value_bool=False)))
+
+    rows = ClientField.objects.filter(template_id=template.id, **{f'{column}__isnull': False})
+    if user_ids is not None:
+        rows = rows.filter(client__created_by__in=user_ids)
+    if start is not None:
+        rows = rows.filter(client__creation_date__gte=start)
+    if end is not None:
+        rows = rows.filter(client__creation_date__lt=end)
+    return {
+        entry.pop('client__created_by'): entry
+        for entry in rows.values('client__created_by').annotate(**aggregates).order_by()
+    }
+
+
+def _snapshot_entry(data):
+    """Plain-dict version of an employee_analytics() entry that can be cached."""
+    employee, last_record = data['employee'], data['last_record']
+    return {
+        'employee': {'id': employee.id, 'username': employee.username, 'last_login': employee.last_login},
+        'total_records': data['total_records'],
+        'last_record': {'id': last_record.id, 'creation_date': last_record.creation_date} if last_record else None,
+        'daily_counts': data['daily_counts'],
+        'monthly_counts': data['monthly_counts'],
+    }
+
+
+def build_snapshot(previous=None):
+    """
+    Compute a cacheable analytics snapshot.
+
+    With a previous snapshot from the same day, only employees who created
+    clients since it was taken (and employees it does not know yet) are
+    recomputed; everyone else is carried over. That only covers new
+    clients, so the build is a full one whenever client_removal_version has
+    moved since the previous snapshot (deletes, reassigns, archives, ...).
+    """
+    today = localdate()
+    # Read before any data, so a removal during the build forces the next one to be full
+    removal_version = client_removal_version.get()
+    last_client_id = Client.objects.aggregate(last=Max('id'))['last'] or 0
+
+    if previous is None or previous['date'] != today or previous.get('removal_version') != removal_version:
+        entries = [_snapshot_entry(data) for data in employee_analytics(today=today)]
+    else:
+        known = {entry['employee']['id'] for entry in previous['employees']}
+        changed = set(
+            Client.objects.filter(id__gt=previous['last_client_id'])
+            .values_list('created_by', flat=True).distinct()
+        )
+        changed.update(User.objects.exclude(id__in=known).values_list('id', flat=True))
+        fresh = {data['employee'].id: _snapshot_entry(data) for data in employee_analytics(changed, today=today)}
+        entries = [fresh.pop(entry['employee']['id'], entry) for entry in previous['employees']]
+        entries.extend(fresh.values())
+        entries.sort(key=lambda entry: entry['employee']['id'])
+
+    # Partial recomputes can start their monthly axis later than the rest
+    first_month = min((month for entry in entries for month in entry['monthly_counts']), default=month_key(today))
+    months = month_range(date(int(first_month[:4]), int(first_month[5:]), 1), today)
+    for entry in entries:
+        entry['monthly_counts'] = {month: entry['monthly_counts'].get(month, 0) for month in months}
+
+    return {
+        'generated_at': now(),
+        'date': today,
+        'last_client_id': last_client_id,
+        'removal_version': removal_version,
+        'employees': entries,
+    }
+
+
+def load_snapshot():
+    return shared_cache.get(SNAPSHOT_CACHE_KEY)
+
+
+def store_snapshot(snapshot):
+    shared_cache.set(SNAPSHOT_CACHE_KEY, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def snapshot_age(snapshot):
+    return (now() - snapshot['generated_at']).total_seconds()
+
+
+def analytics_summary(entries):
+    """Totals across all snapshot entries for the header cards of the analytics page."""
+    last_records = [entry['last_record'] for entry in entries if entry['last_record']]
+    return {
+        'total_records': sum(entry['total_records'] for entry in entries),
+        'last_record_date': max((record['creation_date'] for record in last_records), default=None),
+    }
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LeadtrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'LeadTracker'
+
+    def ready(self):
+        from . import handlers  # noqa: F401  (connects signal receivers)
@@ -0,0 +1,76 @@
+"""
+Hot/cold archival of old and closed clients.
+
+Clients created more than LEADTRACKER_ARCHIVE_AFTER_DAYS ago, or whose field
+values mark them as closed (LEADTRACKER_ARCHIVE_CLOSED_STATES, e.g.
+{'Status': ['Won', 'Lost']}), are moved in chunks from Client/ClientField to
+ArchivedClient/ArchivedClientField, keeping their ids. Dashboard, search and
+duplicate checks then only touch the hot tables; the records API and the
+exports read the archive when asked to with include_archived.
+
+Archived clients still count as created leads: the move deletes the hot rows
+without sending the delete signals, so the rollups keep their counts, and
+rollups.rebuild() and the creation-time index read both tables.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .bulk import DEFAULT_CHUNK_SIZE, delete_rows, run_chunked
+from .models import SHADOW_COLUMNS, ArchivedClient, ArchivedClientField, Client, ClientBlockingKey, ClientField
+from .registry import field_templates
+from .signals import clients_archived
+
+
+def archive_after_days():
+    return getattr(settings, 'LEADTRACKER_ARCHIVE_AFTER_DAYS', 365)
+
+
+def closed_states():
+    return getattr(settings, 'LEADTRACKER_ARCHIVE_CLOSED_STATES', {})
+
+
+def archivable_clients(older_than_days=None, states=None):
+    """
+    Hot clients due for archival.
+
+    A client qualifies when it is older than older_than_days (None or 0 turns
+    the age rule off) or when one of its fields holds a closed state from
+    states ({template name: [values]}). Both default to the settings.
+    """
+    older_than_days = archive_after_days() if older_than_days is None else older_than_days
+    states = closed_states() if states is None else states
+    condition = Q(pk__in=[])
+    if older_than_days:
+        condition |= Q(creation_date__lt=now() - timedelta(days=older_than_days))
+    for name, values in states.items():
+        template = field_templates.by_name(name)
+        if template is None:
+            raise ValueError(f'Unknown field in closed states: {name}')
+        closed = ClientField.objects.filter(template_id=template.id, value__in=list(values))
+        condition |= Q(pk__in=closed.values('client_id'))
+    return Client.objects.filter(condition)
+
+
+def _archive_chunk(chunk):
+    ids = [client.id for client in chunk]
+    ArchivedClient.objects.bulk_create([
+        ArchivedClient(id=client.id, created_by_id=client.created_by_id, creation_date=client.creation_date)
+        for client in chunk
+    ])
+    ArchivedClientField.objects.bulk_create([
+        ArchivedClientField(**row)
+        for row in ClientField.objects.filter(client_id__in=ids).values('client_id', 'template_id', 'value', *SHADOW_COLUMNS)
+    ])
+    ClientBlockingKey.objects.filter(client_id__in=ids).delete()
+    ClientField.objects.filter(client_id__in=ids).delete()
+    # Not Client.delete(): its post_delete receivers would count the clients as deleted leads
+    delete_rows(Client, ids)
+    clients_archived.send(sender=Client, clients=chunk)
+
+
+def archive_clients(clients, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Move clients and their field values to the archive tables; returns a bulk.BulkResult."""
+    return run_chunked(clients, chunk_size, progress, _archive_chunk)
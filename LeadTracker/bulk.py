@@ -0,0 +1,102 @@
+"""
+Chunked bulk delete and owner reassignment of clients.
+
+Deleting or reassigning thousands of clients in one statement holds SQLite's
+write lock for the whole run. These functions walk the selected clients in id
+order and handle chunk_size of them per short transaction, pausing briefly
+between chunks so other writers get the lock, and report progress after every
+chunk. Rows are written with plain DELETE/UPDATE statements instead of per-row
+save()/delete(); each chunk sends clients_deleted or clients_reassigned so the
+rollups and caches are adjusted in the same transaction.
+"""
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from .models import Client, ClientBlockingKey, ClientField
+from .signals import clients_deleted, clients_reassigned
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class BulkResult:
+    def __init__(self, total):
+        self.total = total
+        self.processed = 0
+
+
+def delete_rows(model, ids):
+    """
+    Delete the rows of model with the given ids in one DELETE statement.
+
+    This goes around the deletion collector on purpose: for Client it would
+    load every row to send post_delete per client and cascade on its own,
+    while the callers delete the related rows first and send one bulk signal
+    per chunk instead.
+    """
+    if not ids:
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(ids))})", list(ids))
+
+
+def select_clients(client_ids=None, owner_id=None):
+    """Clients with any of client_ids and/or owned by owner_id."""
+    clients = Client.objects.all()
+    if client_ids is not None:
+        clients = clients.filter(id__in=client_ids)
+    if owner_id is not None:
+        clients = clients.filter(created_by_id=owner_id)
+    return clients
+
+
+def _chunks(clients, chunk_size):
+    # Keyset over id, so chunks that were already deleted or moved do not shift the next one
+    last_id = 0
+    while True:
+        chunk = list(clients.filter(id__gt=last_id).order_by('id').only('id', 'created_by', 'creation_date')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def run_chunked(clients, chunk_size, progress, apply):
+    """Call apply(chunk) for every chunk of clients in its own transaction; returns a BulkResult."""
+    result = BulkResult(clients.count())
+    pause = getattr(settings, 'LEADTRACKER_BULK_PAUSE', 0.05)
+    for chunk in _chunks(clients, chunk_size):
+        with transaction.atomic():
+            apply(chunk)
+        result.processed += len(chunk)
+        if progress:
+            progress(result)
+        if pause:
+            time.sleep(pause)
+    return result
+
+
+def delete_clients(clients, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Delete clients with their field values and blocking keys; returns a BulkResult."""
+    def apply(chunk):
+        ids = [client.id for client in chunk]
+        ClientBlockingKey.objects.filter(client_id__in=ids).delete()
+        # ClientField has no delete receivers or dependents, so this is a single fast DELETE
+        ClientField.objects.filter(client_id__in=ids).delete()
+        delete_rows(Client, ids)
+        clients_deleted.send(sender=Client, clients=chunk)
+
+    return run_chunked(clients, chunk_size, progress, apply)
+
+
+def reassign_clients(clients, owner, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Make owner the creator of clients; returns a BulkResult."""
+    def apply(chunk):
+        Client.objects.filter(id__in=[client.id for client in chunk]).update(created_by=owner, updated_at=now())
+        clients_reassigned.send(sender=Client, clients=chunk, owner=owner)
+
+    return run_chunked(clients.exclude(created_by=owner), chunk_size, progress, apply)
@@ -0,0 +1,104 @@
+"""
+Change feed over clients for integrations that mirror the CRM.
+
+Clients carry updated_at, which save(), field value writes and bulk updates
+move, and every client that leaves the table (deleted or archived) leaves a
+ClientTombstone. changes_since() walks both in (timestamp, id) order from a
+cursor position over their (timestamp, id) indexes, so a sync costs
+O(changes) rather than a read of the whole table.
+
+Rows are only returned once they are older than
+LEADTRACKER_CHANGE_FEED_SETTLE_SECONDS. Timestamps are taken before commit,
+so a slower concurrent transaction can still commit a row stamped just
+before one that was already returned; the delay lets it land first.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+
+from .models import Client, ClientTombstone
+
+
+class ChangeBatch:
+    def __init__(self, changes, position, has_more):
+        self.changes = changes  # [Client or ClientTombstone] in feed order
+        self.position = position
+        self.has_more = has_more
+
+
+def settle_seconds():
+    return getattr(settings, 'LEADTRACKER_CHANGE_FEED_SETTLE_SECONDS', 5)
+
+
+def encode_position(position):
+    """Cursor parts for a (updated_at, client id, deleted_at, tombstone id) position."""
+    updated_at, client_id, deleted_at, tombstone_id = position
+    return [
+        updated_at.isoformat() if updated_at else None, client_id,
+        deleted_at.isoformat() if deleted_at else None, tombstone_id,
+    ]
+
+
+def decode_position(parts):
+    """Inverse of encode_position; raises ValueError for malformed parts."""
+    if not isinstance(parts, list) or len(parts) != 4:
+        raise ValueError('Invalid cursor')
+    updated_at, client_id, deleted_at, tombstone_id = parts
+    try:
+        updated_at = parse_datetime(updated_at) if updated_at else None
+        deleted_at = parse_datetime(deleted_at) if deleted_at else None
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if (updated_at is None) != (client_id is None) or (deleted_at is None) != (tombstone_id is None):
+        raise ValueError('Invalid cursor')
+    if not all(isinstance(pk, int) for pk in (client_id, tombstone_id) if pk is not None):
+        raise ValueError('Invalid cursor')
+    return updated_at, client_id, deleted_at, tombstone_id
+
+
+def _after(queryset, column, moment, pk):
+    if moment is None:
+        return queryset
+    # The leading range condition keeps this a single (column, id) index scan that stops at the limit
+    return queryset.filter(Q(**{f'{column}__gte': moment}), Q(**{f'{column}__gt': moment}) | Q(id__gt=pk))
+
+
+def changes_since(position=None, limit=100, owner_id=None):
+    """
+    Return the next ChangeBatch of up to limit changes after position (from the start when None).
+
+    Clients come back as Client instances with created_by loaded, deletions
+    as ClientTombstone rows. Pass batch.position to the next call.
+    """
+    updated_at, client_id, deleted_at, tombstone_id = position or (None, None, None, None)
+    horizon = now() - timedelta(seconds=settle_seconds())
+
+    clients = _after(Client.objects.filter(updated_at__lt=horizon), 'updated_at', updated_at, client_id)
+    tombstones = _after(ClientTombstone.objects.filter(deleted_at__lt=horizon), 'deleted_at', deleted_at, tombstone_id)
+    if owner_id is not None:
+        clients = clients.filter(created_by_id=owner_id)
+        tombstones = tombstones.filter(owner_id=owner_id)
+    clients = list(clients.select_related('created_by').order_by('updated_at', 'id')[:limit + 1])
+    tombstones = list(tombstones.order_by('deleted_at', 'id')[:limit + 1])
+
+    # Merge both streams by time; each stream keeps its own (timestamp, id) order
+    merged = sorted(
+        [(client.updated_at, 0, client.id, client) for client in clients]
+        + [(tombstone.deleted_at, 1, tombstone.id, tombstone) for tombstone in tombstones],
+        key=lambda entry: entry[:3],
+    )[:limit]
+    changes = [entry[3] for entry in merged]
+
+    for change in changes:
+        if isinstance(change, Client):
+            updated_at, client_id = change.updated_at, change.id
+        else:
+            deleted_at, tombstone_id = change.deleted_at, change.id
+    return ChangeBatch(
+        changes,
+        (updated_at, client_id, deleted_at, tombstone_id),
+        has_more=len(clients) + len(tombstones) > len(changes),
+    )
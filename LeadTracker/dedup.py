@@ -0,0 +1,192 @@
+"""
+Duplicate lead detection with hashed blocking keys.
+
+Templates whose names identify an email, phone or name field (see
+DEDUP_FIELD_NAMES) are key fields. Their values are normalized, hashed and
+stored in ClientBlockingKey, so clients sharing an email, phone number or
+name can be found with one indexed lookup instead of comparing every pair
+of clients. duplicate_clusters() joins all clients that share any key with
+a union-find pass over the keys sorted by value.
+"""
+import hashlib
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Client, ClientBlockingKey, ClientField
+from .registry import field_templates
+
+# Template names (case-insensitive) that hold each kind of key
+DEDUP_FIELD_NAMES = {
+    ClientBlockingKey.KIND_EMAIL: {'email', 'e-mail', 'mail', 'e-posta', 'eposta'},
+    ClientBlockingKey.KIND_PHONE: {'phone', 'phone number', 'telephone', 'mobile', 'gsm', 'telefon', 'tel'},
+    ClientBlockingKey.KIND_NAME: {'name', 'full name', 'customer name', 'ad soyad', 'isim'},
+}
+REINDEX_BATCH_SIZE = 2000
+MIN_PHONE_DIGITS = 7
+# Phone numbers are compared on their last digits so country prefixes do not matter
+PHONE_DIGITS = 10
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_email(value):
+    value = value.strip().lower()
+    local, _, domain = value.partition('@')
+    if not local or '.' not in domain:
+        return ''
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def normalize_phone(value):
+    digits = re.sub(r'\D', '', value)
+    return digits[-PHONE_DIGITS:] if len(digits) >= MIN_PHONE_DIGITS else ''
+
+
+def normalize_name(value):
+    # Turkish dotted/dotless i do not decompose to a plain i
+    value = value.replace('ı', 'i').replace('İ', 'i')
+    value = ''.join(c for c in unicodedata.normalize('NFKD', value) if not unicodedata.combining(c))
+    words = sorted(_WORD.findall(value.casefold()))
+    return ' '.join(words) if len(''.join(words)) >= 3 else ''
+
+
+NORMALIZERS = {
+    ClientBlockingKey.KIND_EMAIL: normalize_email,
+    ClientBlockingKey.KIND_PHONE: normalize_phone,
+    ClientBlockingKey.KIND_NAME: normalize_name,
+}
+
+
+def blocking_key(kind, normalized):
+    return hashlib.sha1(f'{kind}:{normalized}'.encode()).hexdigest()[:16]
+
+
+def key_templates():
+    """{template_id: kind} for the templates that hold dedup keys."""
+    names = getattr(settings, 'LEADTRACKER_DEDUP_FIELDS', DEDUP_FIELD_NAMES)
+    kinds = {name.casefold(): kind for kind, kind_names in names.items() for name in kind_names}
+    return {
+        template.id: kinds[template.name.strip().casefold()]
+        for template in field_templates.all()
+        if template.name.strip().casefold() in kinds
+    }
+
+
+def client_keys(values, templates=None):
+    """Set of (kind, key) for a client's {template_id: value}."""
+    templates = key_templates() if templates is None else templates
+    keys = set()
+    for template_id, value in values.items():
+        kind = templates.get(template_id)
+        if kind and value and (normalized := NORMALIZERS[kind](str(value))):
+            keys.add((kind, blocking_key(kind, normalized)))
+    return keys
+
+
+def index_clients(client_ids):
+    """Recompute the blocking keys of the given clients from their stored fields."""
+    templates = key_templates()
+    client_ids = list(client_ids)
+    if not client_ids:
+        return
+    values = {client_id: {} for client_id in client_ids}
+    if templates:
+        rows = ClientField.objects.filter(client_id__in=client_ids, template_id__in=templates)
+        for client_id, template_id, value in rows.values_list('client_id', 'template_id', 'value'):
+            values[client_id][template_id] = value
+    with transaction.atomic():
+        ClientBlockingKey.objects.filter(client_id__in=client_ids).delete()
+        ClientBlockingKey.objects.bulk_create([
+            ClientBlockingKey(client_id=client_id, kind=kind, key=key)
+            for client_id, client_values in values.items()
+            for kind, key in client_keys(client_values, templates)
+        ])
+
+
+def reindex_all(batch_size=REINDEX_BATCH_SIZE):
+    """Rebuild the blocking keys of every client; returns the number of clients."""
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(Client.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return total
+        index_clients(ids)
+        total += len(ids)
+        last_id = ids[-1]
+
+
+def find_matches(keys, exclude_client_id=None, limit=20):
+    """{client_id: [matching kinds]} for clients sharing any of keys, newest first."""
+    if not keys:
+        return {}
+    condition = Q()
+    for kind, key in keys:
+        condition |= Q(kind=kind, key=key)
+    rows = ClientBlockingKey.objects.filter(condition)
+    if exclude_client_id is not None:
+        rows = rows.exclude(client_id=exclude_client_id)
+    matches = {}
+    for client_id, kind in rows.order_by('-client_id').values_list('client_id', 'kind'):
+        if client_id not in matches and len(matches) >= limit:
+            break
+        matches.setdefault(client_id, []).append(kind)
+    return matches
+
+
+def duplicate_clusters(kinds=None, max_block_size=50):
+    """
+    Group clients that share a blocking key, transitively.
+
+    Streams the keys sorted by (kind, key), unions the clients of each block
+    and returns [(sorted client ids, set of kinds)] for clusters of two or
+    more clients. Blocks larger than max_block_size (placeholder values such
+    as a shared office number) are skipped. Runs in O(n log n) for n keys.
+    """
+    parent = {}
+    reasons = {}
+
+    def find(item):
+        parent.setdefault(item, item)
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(a, b, kind):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+            reasons.setdefault(root_a, set()).update(reasons.pop(root_b, ()))
+        reasons.setdefault(root_a, set()).add(kind)
+
+    def flush(block, kind):
+        if 1 < len(block) <= max_block_size:
+            for client_id in block[1:]:
+                union(block[0], client_id, kind)
+
+    rows = ClientBlockingKey.objects.order_by('kind', 'key', 'client_id')
+    if kinds:
+        rows = rows.filter(kind__in=kinds)
+    current, block = None, []
+    for kind, key, client_id in rows.values_list('kind', 'key', 'client_id').iterator(chunk_size=REINDEX_BATCH_SIZE):
+        if (kind, key) != current:
+            if current is not None:
+                flush(block, current[0])
+            current, block = (kind, key), []
+        block.append(client_id)
+    if current is not None:
+        flush(block, current[0])
+
+    clusters = {}
+    for client_id in parent:
+        clusters.setdefault(find(client_id), []).append(client_id)
+    return [
+        (sorted(members), reasons.get(root, set()))
+        for root, members in clusters.items()
+        if len(members) > 1
+    ]
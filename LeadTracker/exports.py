@@ -0,0 +1,81 @@
+"""
+Export helpers shared by the download views.
+
+Rows are produced lazily from grid.iter_pivot_rows, one column per
+FieldTemplate, so memory stays flat no matter how many clients are exported.
+An optional archived queryset of ArchivedClient rows is appended after the
+hot clients.
+"""
+import csv
+import json
+
+from openpyxl import Workbook
+
+from .grid import iter_pivot_rows
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def export_headers(field_templates):
+    return ['ID', 'Created By', 'Creation Date'] + [field.name for field in field_templates]
+
+
+def export_rows(queryset, field_templates, chunk_size=2000, archived=None):
+    """Yield one flat list per client: id, owner, creation date, then template values."""
+    for source in (queryset, archived):
+        if source is None:
+            continue
+        for row in iter_pivot_rows(source, field_templates, chunk_size=chunk_size):
+            client = row['client']
+            yield [
+                client.id,
+                client.created_by.username,
+                client.creation_date.strftime(DATE_FORMAT),
+                *row['values'],
+            ]
+
+
+def write_xlsx(fileobj, queryset, field_templates, chunk_size=2000, archived=None):
+    """
+    Write the export to fileobj using openpyxl's write-only mode.
+
+    Write-only worksheets spill rows to a temporary file as they are
+    appended instead of keeping a cell object per value in memory.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Detailed Records")
+    worksheet.append(export_headers(field_templates))
+    for values in export_rows(queryset, field_templates, chunk_size=chunk_size, archived=archived):
+        worksheet.append(values)
+    workbook.save(fileobj)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, field_templates, chunk_size=2000, archived=None):
+    """Yield the export as CSV lines, header first."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(export_headers(field_templates))
+    for values in export_rows(queryset, field_templates, chunk_size=chunk_size, archived=archived):
+        yield writer.writerow(values)
+
+
+def iter_ndjson(queryset, field_templates, chunk_size=2000, archived=None):
+    """Yield the export as newline-delimited JSON, one object per client."""
+    names = [field.name for field in field_templates]
+    for values in export_rows(queryset, field_templates, chunk_size=chunk_size, archived=archived):
+        record = {
+            'id': values[0],
+            'created_by': values[1],
+            'creation_date': values[2],
+            'fields': dict(zip(names, values[3:])),
+        }
+        yield json.dumps(record, ensure_ascii=False) + '\n'
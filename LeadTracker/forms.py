@@ -1,46 +1,64 @@
 from django import forms
 from django.forms import ModelForm
-from .models import FieldTemplate, Client, ClientField
+from .models import TYPED_COLUMNS, Client, ClientField, FieldTemplate, format_value, typed_columns
+from .registry import field_templates as field_registry
 import logging
 
 logger = logging.getLogger(__name__)
 
-class DynamicClientForm(ModelForm):
+def dynamic_field_values(cleaned_data):
+    """Map the 'field_<template id>' entries of cleaned_data to {template_id: stored text}."""
+    return {
+        int(name.split('_')[1]): format_value(value)
+        for name, value in cleaned_data.items()
+        if name.startswith('field_')
+    }
+
+def _form_field(field_type, **kwargs):
+    if field_type == FieldTemplate.TYPE_INT:
+        return forms.IntegerField(**kwargs)
+    if field_type == FieldTemplate.TYPE_DECIMAL:
+        return forms.DecimalField(max_digits=20, decimal_places=6, **kwargs)
+    if field_type == FieldTemplate.TYPE_DATE:
+        return forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}), **kwargs)
+    if field_type == FieldTemplate.TYPE_BOOL:
+        return forms.NullBooleanField(**kwargs)
+    return forms.CharField(**kwargs)
+
+class DynamicFieldsMixin:
+    """Adds one form field per FieldTemplate, typed after it and pre-filled from the bound instance."""
+
+    def add_dynamic_fields(self):
+        # A single query for all stored values, whatever the number of templates
+        initial_values = ClientField.objects.value_map(self.instance)
+        for field in field_registry.all():
+            initial = initial_values.get(field.id, '')
+            if field.field_type in TYPED_COLUMNS:
+                # Stored text may be in any accepted format; show the parsed value
+                parsed = typed_columns(field.field_type, initial)[TYPED_COLUMNS[field.field_type]]
+                initial = initial if parsed is None else parsed
+            self.fields[f'field_{field.id}'] = _form_field(
+                field.field_type,
+                label=field.name,
+                required=False,
+                initial=initial
+            )
+
+class DynamicClientForm(DynamicFieldsMixin, ModelForm):
     class Meta:
         model = Client
         fields = []  # Exclude all fields; dynamic fields will be added in __init__
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        field_templates = FieldTemplate.objects.all()
-        for field in field_templates:
-            if self.instance.pk:  # If updating an existing instance
-                client_field = self.instance.fields.filter(template=field).first()
-                self.fields[f'field_{field.id}'] = forms.CharField(
-                    label=field.name,
-                    required=False,
-                    initial=client_field.value if client_field else ''
-                )
-            else:  # For new instances
-                self.fields[f'field_{field.id}'] = forms.CharField(
-                    label=field.name,
-                    required=False
-                )
+        self.add_dynamic_fields()
 
     def save(self, commit=True):
         instance = super().save(commit=False)
         if commit:
             instance.save()
         # Save dynamic fields
-        for field_name, value in self.cleaned_data.items():
-            if field_name.startswith('field_'):
-                field_id = int(field_name.split('_')[1])
-                template = FieldTemplate.objects.get(id=field_id)
-                ClientField.objects.update_or_create(
-                    client=instance,
-                    template=template,
-                    defaults={'value': value}
-                )
+        ClientField.objects.upsert_values(instance, dynamic_field_values(self.cleaned_data))
         return instance
 
 class ClientUpdateForm(ModelForm):
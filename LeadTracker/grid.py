@@ -0,0 +1,349 @@
+"""
+Pivot helpers that turn Client + ClientField rows into a clients x templates grid.
+
+The EAV layout stores one ClientField row per (client, template). Rendering
+that per client in a template costs one query per cell, so the helpers here
+load a page of clients in one query and all of its field values in a second
+one, then pivot them in Python.
+
+Clients can also be filtered and sorted by field values: "field.<Name>"
+query parameters (optionally "field.<Name>__<lookup>") become EXISTS
+subqueries against ClientField, and "field:<Name>" sort keys page through
+ClientField in value order. For typed templates (int, decimal, date,
+bool) comparisons and sorts use the matching typed column, so "10" sorts
+after "9" and dates compare as dates. Each column has a (template, column,
+client) index.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef, Q
+
+from .models import TYPED_COLUMNS, field_model_for, typed_columns
+from .registry import field_templates as field_registry
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Sort keys accepted from the query string -> ORM column used for ordering
+SORT_COLUMNS = {
+    'id': 'id',
+    'creation_date': 'creation_date',
+    'created_by': 'created_by__username',
+}
+DEFAULT_SORT = '-creation_date'
+
+FIELD_PARAM_PREFIX = 'field.'
+FIELD_SORT_PREFIX = 'field:'
+TEXT_LOOKUPS = {'iexact', 'contains', 'icontains', 'startswith', 'istartswith', 'endswith', 'iendswith'}
+VALUE_LOOKUPS = {'exact', 'gt', 'gte', 'lt', 'lte', 'in'}
+FIELD_LOOKUPS = TEXT_LOOKUPS | VALUE_LOOKUPS
+
+
+def encode_cursor(*parts):
+    """Encode a keyset position as an opaque, url-safe token."""
+    raw = json.dumps(parts, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor; returns None if it is malformed."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    return parts if isinstance(parts, list) else None
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def pivot_rows(clients, field_templates, default=''):
+    """
+    Pair every client with its field values ordered like field_templates.
+
+    Issues a single query for the values of all given clients, so the cost
+    does not depend on the number of clients or templates. Works for Client
+    and ArchivedClient alike.
+    """
+    clients = list(clients)
+    if not clients:
+        return []
+    values = {}
+    field_rows = (
+        field_model_for(type(clients[0])).objects
+        .filter(client_id__in=[client.id for client in clients])
+        .values_list('client_id', 'template_id', 'value')
+    )
+    for client_id, template_id, value in field_rows:
+        values[(client_id, template_id)] = value
+
+    return [
+        {
+            'client': client,
+            'values': [values.get((client.id, field.id), default) for field in field_templates],
+        }
+        for client in clients
+    ]
+
+
+def _typed_value(template, column, text):
+    value = typed_columns(template.field_type, text)[column]
+    if value is None:
+        raise ValueError(f'Invalid {template.field_type} value for {template.name}: {text}')
+    return value
+
+
+def field_filters(params):
+    """
+    Parse field.<Name>[__<lookup>]=value pairs from params into (template, column, lookup, value).
+
+    Blank values are ignored; "in" takes a comma separated list. Text
+    lookups (contains, startswith, ...) always match the stored text; the
+    others use the typed column of typed templates. Raises ValueError for
+    unknown field names or lookups and for values that do not parse.
+    """
+    filters = []
+    for key, value in params.items():
+        if not key.startswith(FIELD_PARAM_PREFIX) or value == '':
+            continue
+        name, lookup = key[len(FIELD_PARAM_PREFIX):], 'exact'
+        if '__' in name:
+            name, lookup = name.rsplit('__', 1)
+        template = field_registry.by_name(name)
+        if template is None:
+            raise ValueError(f'Unknown field: {name}')
+        if lookup not in FIELD_LOOKUPS:
+            raise ValueError(f'Unsupported lookup: {lookup}')
+        column = 'value'
+        if lookup in VALUE_LOOKUPS and template.field_type in TYPED_COLUMNS:
+            column = TYPED_COLUMNS[template.field_type]
+        if lookup == 'in':
+            value = [part.strip() for part in value.split(',')]
+            if column != 'value':
+                value = [_typed_value(template, column, part) for part in value]
+        elif column != 'value':
+            value = _typed_value(template, column, value)
+        filters.append((template, column, lookup, value))
+    return filters
+
+
+def filter_by_fields(queryset, filters):
+    for template, column, lookup, value in filters:
+        queryset = queryset.with_field(template.id, lookup, value, column=column)
+    return queryset
+
+
+def resolve_sort(sort):
+    """
+    Return (column, template) for a sort key such as "-creation_date" or "field:City".
+
+    For field sorts column is the field value column of template (the typed
+    one for typed templates); otherwise it is a Client column and template is
+    None. Raises ValueError for unknown keys.
+    """
+    key = sort.lstrip('-')
+    if key in SORT_COLUMNS:
+        return SORT_COLUMNS[key], None
+    if key.startswith(FIELD_SORT_PREFIX):
+        template = field_registry.by_name(key[len(FIELD_SORT_PREFIX):])
+        if template is not None:
+            return TYPED_COLUMNS.get(template.field_type, 'value'), template
+    raise ValueError(f'Unknown sort: {sort}')
+
+
+def _sort_value(client, column):
+    value = client
+    for attr in column.split('__'):
+        value = getattr(value, attr)
+    return value
+
+
+def _cursor_position(queryset, column, template, cursor):
+    """Decode a paginate_clients cursor to (direction, value, pk); raises ValueError if it is not one."""
+    if not cursor:
+        return None
+    position = decode_cursor(cursor)
+    if position is None or len(position) != 3 or position[0] not in ('next', 'prev'):
+        raise ValueError('Invalid cursor')
+    direction, value, pk = position
+    if not isinstance(pk, int) or isinstance(pk, bool):
+        raise ValueError('Invalid cursor')
+    if template is None:
+        output_field = queryset.all().query.resolve_ref(column).output_field
+    else:
+        output_field = field_model_for(queryset.model)._meta.get_field(column)
+    # None marks the clients without a value, which only field sorts have
+    if value is None:
+        if template is None:
+            raise ValueError('Invalid cursor')
+        return direction, value, pk
+    # The value must be one the sort column can hold, or the page query itself fails
+    try:
+        value = output_field.to_python(value)
+    except ValidationError:
+        raise ValueError('Invalid cursor')
+    return direction, value, pk
+
+
+def _client_scan(queryset, column, descending, position, limit):
+    """Up to limit (sort value, client) pairs of queryset after position, ordered by (column, id)."""
+    lookup = 'lt' if descending else 'gt'
+    prefix = '-' if descending else ''
+    if position is not None:
+        _, value, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{column}__{lookup}': value}) | Q(**{column: value, f'id__{lookup}': pk})
+        )
+    clients = queryset.order_by(f'{prefix}{column}', f'{prefix}id')[:limit]
+    return [(_sort_value(client, column), client) for client in clients]
+
+
+def _field_scan(queryset, template, column, descending, backwards, position, limit):
+    """
+    Up to limit (sort value, client) pairs of queryset after position, ordered by a field value.
+
+    Clients with a value are walked from the field values in (column,
+    client id) order, which the (template, column, client) index serves
+    directly. Clients without one sort after them in either direction, by
+    id, with None as their sort value. Finding those has no index to walk,
+    so a forward scan only gets there once the valued ones run out.
+    """
+    lookup, bound = ('lt', 'lte') if descending else ('gt', 'gte')
+    prefix = '-' if descending else ''
+    values = field_model_for(queryset.model).objects.filter(template_id=template.id, **{f'{column}__isnull': False})
+
+    def missing(after, count):
+        clients = queryset.exclude(Exists(values.filter(client=OuterRef('pk'))))
+        if after is not None:
+            clients = clients.filter(**{f'id__{lookup}': after})
+        return [(None, client) for client in clients.order_by(f'{prefix}id')[:count]]
+
+    def valued(after, count):
+        rows = values.filter(client__in=queryset.values('id'))
+        if after is not None:
+            value, pk = after
+            # The leading range condition keeps this a single index range scan
+            rows = rows.filter(
+                Q(**{f'{column}__{bound}': value}), Q(**{f'{column}__{lookup}': value}) | Q(**{f'client_id__{lookup}': pk})
+            )
+        rows = list(rows.order_by(f'{prefix}{column}', f'{prefix}client_id').values_list(column, 'client_id')[:count])
+        clients = queryset.in_bulk([client_id for _, client_id in rows])
+        return [(value, clients[client_id]) for value, client_id in rows if client_id in clients]
+
+    phases = [('valued', valued), ('missing', missing)]
+    if backwards:
+        phases.reverse()
+    after = None
+    if position is not None:
+        _, value, pk = position
+        current = 'missing' if value is None else 'valued'
+        # Phases before the cursor's are done; the cursor's resumes after it
+        while phases[0][0] != current:
+            phases.pop(0)
+        after = pk if value is None else (value, pk)
+    pairs = []
+    for _, scan in phases:
+        pairs += scan(after, limit - len(pairs))
+        if len(pairs) >= limit:
+            break
+        after = None
+    return pairs
+
+
+class ClientGridPage:
+    """One keyset-paginated page of the pivoted client grid."""
+
+    def __init__(self, rows, sort, next_cursor=None, previous_cursor=None):
+        self.rows = rows
+        self.sort = sort
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def paginate_clients(queryset, field_templates, sort=None, cursor=None, per_page=DEFAULT_PAGE_SIZE, default=''):
+    """
+    Return a ClientGridPage for queryset using keyset pagination on (sort column, id).
+
+    Keyset pagination keeps every page an index range scan instead of an
+    OFFSET walk, so the last page is as cheap as the first one. The cursor
+    tokens embed the direction ('next'/'prev') and the boundary row; a
+    cursor that does not decode to one raises ValueError.
+    """
+    sort = sort or DEFAULT_SORT
+    try:
+        column, template = resolve_sort(sort)
+    except ValueError:
+        sort = DEFAULT_SORT
+        column, template = resolve_sort(sort)
+    descending = sort.startswith('-')
+
+    position = _cursor_position(queryset, column, template, cursor)
+    backwards = position is not None and position[0] == 'prev'
+
+    # Walking backwards is the same scan with the ordering flipped
+    scan_descending = descending != backwards
+    queryset = queryset.select_related('created_by')
+    if template is None:
+        pairs = _client_scan(queryset, column, scan_descending, position, per_page + 1)
+    else:
+        pairs = _field_scan(queryset, template, column, scan_descending, backwards, position, per_page + 1)
+
+    has_more = len(pairs) > per_page
+    pairs = pairs[:per_page]
+    if backwards:
+        pairs.reverse()
+    clients = [client for _, client in pairs]
+
+    next_cursor = previous_cursor = None
+    if pairs:
+        (first_value, first), (last_value, last) = pairs[0], pairs[-1]
+        # Coming back from a later page means there is always a next page,
+        # and moving forward from a cursor means there is always a previous one
+        if has_more or backwards:
+            next_cursor = encode_cursor('next', last_value, last.id)
+        if position is not None and (has_more or not backwards):
+            previous_cursor = encode_cursor('prev', first_value, first.id)
+
+    return ClientGridPage(
+        rows=pivot_rows(clients, field_templates, default=default),
+        sort=sort,
+        next_cursor=next_cursor,
+        previous_cursor=previous_cursor,
+    )
+
+
+def iter_pivot_rows(queryset, field_templates, chunk_size=2000, default=''):
+    """
+    Yield pivoted rows for every client in queryset, ordered by id.
+
+    Clients are fetched in id-keyset chunks (two queries per chunk), so only
+    one chunk is held in memory at a time regardless of the table size.
+    """
+    queryset = queryset.select_related('created_by').order_by('id')
+    last_id = 0
+    while True:
+        clients = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not clients:
+            return
+        yield from pivot_rows(clients, field_templates, default=default)
+        if len(clients) < chunk_size:
+            return
+        last_id = clients[-1].id
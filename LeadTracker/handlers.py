@@ -0,0 +1,160 @@
+"""
+Signal receivers for LeadTracker models, connected in LeadtrackerConfig.ready().
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.timezone import localdate, now
+
+from Custom_user.models import User
+
+from . import dedup, jobs, rollups
+from .activity import recorder as activity
+from .models import Client, ClientField, ClientTombstone, FieldTemplate
+from .registry import client_data_version, client_removal_version, field_templates
+from .signals import client_fields_saved, clients_archived, clients_deleted, clients_imported, clients_reassigned
+from .timeindex import creation_times
+
+
+@receiver(post_save, sender=FieldTemplate)
+@receiver(post_delete, sender=FieldTemplate)
+def invalidate_field_templates(sender, **kwargs):
+    # After commit, so no process can load the old rows under the new stamp
+    transaction.on_commit(field_templates.invalidate)
+
+
+@receiver(pre_save, sender=FieldTemplate)
+def remember_field_type(sender, instance, **kwargs):
+    instance._previous_field_type = (
+        FieldTemplate.objects.filter(pk=instance.pk).values_list('field_type', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=FieldTemplate)
+def retype_field_values(sender, instance, created, **kwargs):
+    # Existing values only need new typed columns when the type actually changed
+    if not created and instance.field_type != getattr(instance, '_previous_field_type', instance.field_type):
+        transaction.on_commit(lambda: jobs.submit(jobs.retype_field_values, instance.id))
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=ClientField)
+@receiver(client_fields_saved)
+@receiver(clients_imported)
+@receiver(clients_deleted)
+@receiver(clients_reassigned)
+@receiver(clients_archived)
+def bump_client_data_version(sender, **kwargs):
+    # After commit, so nothing derived from the old rows is cached under the new stamp
+    transaction.on_commit(client_data_version.bump)
+
+
+@receiver(post_save, sender=Client)
+def count_created_client(sender, instance, created, **kwargs):
+    if created:
+        rollups.record([(instance.created_by_id, instance.creation_date, 1)])
+        # The buffer is outside the transaction, so a rolled back create must not reach it
+        owner_id, day = instance.created_by_id, localdate(instance.creation_date)
+        transaction.on_commit(lambda: activity.add_records(owner_id, day))
+
+
+@receiver(post_delete, sender=Client)
+def count_deleted_client(sender, instance, **kwargs):
+    rollups.record([(instance.created_by_id, instance.creation_date, -1)])
+
+
+@receiver(clients_imported)
+def count_imported_clients(sender, clients, **kwargs):
+    rollups.record((client.created_by_id, client.creation_date, 1) for client in clients)
+    days = [(client.created_by_id, localdate(client.creation_date)) for client in clients]
+
+    def add_records():
+        for owner_id, day in days:
+            activity.add_records(owner_id, day)
+    transaction.on_commit(add_records)
+
+
+@receiver(clients_deleted)
+def count_bulk_deleted_clients(sender, clients, **kwargs):
+    rollups.record((client.created_by_id, client.creation_date, -1) for client in clients)
+
+
+@receiver(clients_reassigned)
+def count_reassigned_clients(sender, clients, owner, **kwargs):
+    events = []
+    for client in clients:
+        events.append((client.created_by_id, client.creation_date, -1))
+        events.append((owner.id, client.creation_date, 1))
+    rollups.record(events)
+
+
+@receiver(post_save, sender=Client)
+def invalidate_moved_creation_time(sender, instance, created, **kwargs):
+    # New clients are picked up incrementally; other saves only matter if they
+    # move the client. _loaded_timing comes from Client.from_db (None if unknown).
+    current = (instance.created_by_id, instance.creation_date)
+    if not created and getattr(instance, '_loaded_timing', None) != current:
+        creation_times.invalidate()
+        transaction.on_commit(client_removal_version.bump)
+    instance._loaded_timing = current
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=User)
+@receiver(clients_deleted)
+@receiver(clients_reassigned)
+@receiver(clients_archived)
+def bump_client_removal_version(sender, **kwargs):
+    transaction.on_commit(client_removal_version.bump)
+
+
+@receiver(post_delete, sender=Client)
+@receiver(clients_deleted)
+@receiver(clients_reassigned)
+def invalidate_creation_times(sender, **kwargs):
+    creation_times.invalidate()
+
+
+@receiver(client_fields_saved)
+def index_saved_client(sender, client, **kwargs):
+    dedup.index_clients([client.id])
+
+
+@receiver(clients_imported)
+def index_imported_clients(sender, clients, **kwargs):
+    dedup.index_clients(client.id for client in clients)
+
+
+# No post_delete receiver on ClientField (here or above): it would turn the
+# cascade of every Client delete into a per-field walk, and a deleted client
+# leaves a tombstone and bumps the data version through the Client signals
+@receiver(post_save, sender=ClientField)
+def touch_client_of_field(sender, instance, **kwargs):
+    Client.objects.filter(pk=instance.client_id).update(updated_at=now())
+
+
+@receiver(client_fields_saved)
+def touch_saved_client(sender, client, **kwargs):
+    Client.objects.filter(pk=client.pk).update(updated_at=now())
+
+
+@receiver(post_delete, sender=Client)
+def record_deleted_client(sender, instance, **kwargs):
+    ClientTombstone.objects.create(client_id=instance.id, owner_id=instance.created_by_id)
+
+
+@receiver(clients_deleted)
+def record_bulk_deleted_clients(sender, clients, **kwargs):
+    ClientTombstone.objects.bulk_create([
+        ClientTombstone(client_id=client.id, owner_id=client.created_by_id) for client in clients
+    ])
+
+
+@receiver(clients_archived)
+def record_archived_clients(sender, clients, **kwargs):
+    ClientTombstone.objects.bulk_create([
+        ClientTombstone(client_id=client.id, owner_id=client.created_by_id, reason=ClientTombstone.REASON_ARCHIVED)
+        for client in clients
+    ])
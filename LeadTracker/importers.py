@@ -0,0 +1,172 @@
+"""
+Bulk lead import from CSV or XLSX files.
+
+The file is read row by row (csv.reader / openpyxl read-only mode) and
+written in large batches: one bulk INSERT for the clients of a batch and one
+for their field values, inside a single transaction per batch. Header
+columns are matched to FieldTemplate names case-insensitively; the "Created
+By" column of our own exports selects the owner, and the other export-only
+columns ("ID", "Creation Date") are ignored.
+"""
+import csv
+import datetime
+import io
+
+from django.db import transaction
+from openpyxl import load_workbook
+
+from Custom_user.models import User
+
+from .models import Client, ClientField, typed_columns
+from .registry import field_templates
+from .signals import clients_imported
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+OWNER_COLUMN = 'created by'
+IGNORED_COLUMNS = {'id', 'creation date'}
+MAX_VALUE_LENGTH = ClientField._meta.get_field('value').max_length
+
+
+class LeadImportError(Exception):
+    """Raised when the file cannot be imported at all (e.g. no usable header)."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []  # (row number, message), capped at MAX_REPORTED_ERRORS
+        self.skipped_columns = []
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+def read_rows(fileobj, filename):
+    """Yield the rows of a CSV or XLSX file as lists of cell values, header included."""
+    if filename.lower().endswith('.xlsx'):
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        yield from csv.reader(io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline=''))
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _map_header(header, result):
+    """Return (owner column index or None, [(column index, template id)])."""
+    owner_index = None
+    columns = []
+    for index, name in enumerate(header):
+        name = _cell_text(name)
+        key = name.casefold()
+        if not key or key in IGNORED_COLUMNS:
+            continue
+        if key == OWNER_COLUMN:
+            owner_index = index
+            continue
+        template = field_templates.by_name(name)
+        if template is None:
+            result.skipped_columns.append(name)
+        else:
+            columns.append((index, template.id))
+    return owner_index, columns
+
+
+def _row_values(row, columns):
+    values = {}
+    for index, template_id in columns:
+        value = _cell_text(row[index]) if index < len(row) else ''
+        if len(value) > MAX_VALUE_LENGTH:
+            raise ValueError(f"Value longer than {MAX_VALUE_LENGTH} characters.")
+        values[template_id] = value
+    return values
+
+
+def _flush(batch, result):
+    with transaction.atomic():
+        clients = Client.objects.bulk_create([Client(created_by_id=owner_id) for owner_id, _ in batch])
+        ClientField.objects.bulk_create([
+            ClientField(
+                client=client, template_id=template_id, value=value,
+                **typed_columns(field_templates.get(template_id).field_type, value),
+            )
+            for client, (_, values) in zip(clients, batch)
+            for template_id, value in values.items()
+        ])
+    result.created += len(clients)
+    clients_imported.send(sender=Client, clients=clients)
+
+
+def import_leads(rows, owner=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Import rows (an iterable whose first item is the header) as clients.
+
+    owner is used for rows without a "Created By" value. progress, when
+    given, is called with the ImportResult after every batch.
+    """
+    result = ImportResult()
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise LeadImportError("The file is empty.")
+    owner_index, columns = _map_header(header, result)
+    if not columns:
+        raise LeadImportError("No column matches a field template name.")
+    if owner_index is None and owner is None:
+        raise LeadImportError("No owner given and the file has no 'Created By' column.")
+
+    owners = dict(User.objects.values_list('username', 'id'))
+    default_owner_id = owner.id if owner is not None else None
+    batch = []
+
+    for row_number, row in enumerate(rows, start=2):
+        if not any(_cell_text(cell) for cell in row):
+            continue
+        result.rows += 1
+
+        owner_id = default_owner_id
+        if owner_index is not None and owner_index < len(row) and _cell_text(row[owner_index]):
+            username = _cell_text(row[owner_index])
+            owner_id = owners.get(username)
+            if owner_id is None:
+                result.add_error(row_number, f"Unknown user '{username}'.")
+                continue
+        if owner_id is None:
+            result.add_error(row_number, "Row has no owner.")
+            continue
+
+        try:
+            values = _row_values(row, columns)
+        except ValueError as e:
+            result.add_error(row_number, str(e))
+            continue
+
+        batch.append((owner_id, values))
+        if len(batch) >= batch_size:
+            _flush(batch, result)
+            batch = []
+            if progress:
+                progress(result)
+
+    if batch:
+        _flush(batch, result)
+    if progress:
+        progress(result)
+    return result
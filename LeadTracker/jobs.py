@@ -0,0 +1,315 @@
+"""
+Background export and import jobs.
+
+Exports are built in a small in-process thread pool and written to
+MEDIA_ROOT/exports/. Each job records a fingerprint of the data it was built
+from; enqueueing an export whose fingerprint matches a finished job returns
+that job instead of building the file again.
+
+Uploaded lead files are imported in the same pool; their progress is kept
+in the cache under a per-upload key. Stale analytics snapshots are rebuilt
+there too, as are typed field values after a template changes type and
+bulk deletes and owner reassignments of clients.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Max
+from django.utils.timezone import now
+
+from Custom_user.models import User
+
+from . import analytics, bulk
+from .exports import write_xlsx
+from .importers import LeadImportError, import_leads, read_rows
+from .models import SHADOW_COLUMNS, ArchivedClient, Client, ClientField, ClientTombstone, ExportJob, FieldTemplate, typed_columns
+from .registry import client_data_version, field_templates, shared_cache
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FINGERPRINT_TIMEOUT = 86400
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'LEADTRACKER_JOB_WORKERS', 2),
+            thread_name_prefix='leadtracker-jobs',
+        )
+    return _executor
+
+
+def _run_in_worker(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background job %s failed", getattr(func, '__name__', func))
+        raise
+    finally:
+        close_old_connections()
+
+
+def submit(func, *args, **kwargs):
+    """Run func in the background pool with its own database connection."""
+    return executor().submit(_run_in_worker, func, *args, **kwargs)
+
+
+def export_queryset(username, model=Client):
+    return model.objects.filter(created_by__username=username) if username else model.objects.all()
+
+
+def export_fingerprint(username, include_archived=False):
+    """
+    Hash everything an export depends on; equal fingerprints mean an identical file.
+
+    The hash is cached under the template and client data version stamps,
+    which every write moves, so the aggregates over the tables only run
+    when the data changed or the cache lost the entry.
+    """
+    versions = (field_templates.version(), client_data_version.get())
+    key = 'export_fingerprint:{}:{}:{}:{}'.format(*versions, username or '', int(include_archived))
+    fingerprint = cache.get(key)
+    if fingerprint is None:
+        fingerprint = _scan_fingerprint(username, include_archived, versions)
+        cache.set(key, fingerprint, EXPORT_FINGERPRINT_TIMEOUT)
+    return fingerprint
+
+
+def _scan_fingerprint(username, include_archived, versions):
+    clients = export_queryset(username)
+    client_stats = clients.aggregate(count=Count('id'), last=Max('id'), updated=Max('updated_at'))
+    field_stats = ClientField.objects.filter(client__in=clients).aggregate(count=Count('id'), last=Max('id'))
+    # updated_at and the tombstones record edits and deletes even if the cached version stamp was lost
+    last_tombstone = ClientTombstone.objects.aggregate(last=Max('id'))['last']
+    parts = [
+        username or '',
+        *versions,
+        client_stats['count'], client_stats['last'], client_stats['updated'],
+        field_stats['count'], field_stats['last'],
+        last_tombstone,
+    ]
+    if include_archived:
+        archived = export_queryset(username, ArchivedClient)
+        archived_stats = archived.aggregate(count=Count('id'), last=Max('id'))
+        parts.extend(['archived', archived_stats['count'], archived_stats['last']])
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def enqueue_export(username, requested_by=None, include_archived=False):
+    """
+    Return a job for exporting username's records (all records when empty),
+    followed by their archived records when include_archived is set.
+
+    A finished job with the same fingerprint whose file still exists is
+    returned as is, as is a pending or running one that is not stale.
+    """
+    username = username or ''
+    fingerprint = export_fingerprint(username, include_archived)
+    stale_before = now() - timedelta(seconds=getattr(settings, 'EXPORT_JOB_TIMEOUT', 3600))
+
+    candidates = ExportJob.objects.filter(username=username, include_archived=include_archived, fingerprint=fingerprint)
+    for job in candidates.exclude(status=ExportJob.STATUS_FAILED)[:5]:
+        if job.status == ExportJob.STATUS_DONE and job.file and job.file.storage.exists(job.file.name):
+            return job
+        if job.status in (ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING) and job.created_at >= stale_before:
+            return job
+
+    job = ExportJob.objects.create(
+        username=username, include_archived=include_archived, fingerprint=fingerprint, requested_by=requested_by,
+    )
+    transaction.on_commit(lambda: submit(run_export_job, job.id))
+    return job
+
+
+def run_export_job(job_id):
+    job = ExportJob.objects.get(id=job_id)
+    job.status = ExportJob.STATUS_RUNNING
+    job.save(update_fields=['status'])
+    try:
+        with tempfile.TemporaryFile() as spool:
+            archived = export_queryset(job.username, ArchivedClient) if job.include_archived else None
+            write_xlsx(spool, export_queryset(job.username), field_templates.all(), archived=archived)
+            spool.seek(0)
+            prefix = f'{job.username}_' if job.username else ''
+            job.file.save(f'{prefix}Detailed_Records_{job.fingerprint[:12]}.xlsx', File(spool), save=False)
+    except Exception as e:
+        job.status = ExportJob.STATUS_FAILED
+        job.error = str(e)
+        job.finished_at = now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+
+    job.status = ExportJob.STATUS_DONE
+    job.finished_at = now()
+    job.save(update_fields=['status', 'file', 'finished_at'])
+
+    # Only the latest artifact per export target is worth keeping on disk
+    previous = ExportJob.objects.filter(username=job.username, include_archived=job.include_archived, status=ExportJob.STATUS_DONE)
+    for old in previous.exclude(id=job.id):
+        if old.file:
+            old.file.delete(save=False)
+        old.delete()
+
+
+IMPORT_PROGRESS_TIMEOUT = 86400
+
+
+def _import_progress_key(token):
+    return f'lead_import:{token}'
+
+
+def import_progress(token):
+    return shared_cache.get(_import_progress_key(token))
+
+
+def _store_import_progress(token, status, result=None, error=''):
+    progress = {'status': status, 'error': error, 'rows': 0, 'created': 0, 'error_count': 0, 'errors': [], 'skipped_columns': []}
+    if result is not None:
+        progress.update(
+            rows=result.rows,
+            created=result.created,
+            error_count=result.error_count,
+            errors=result.errors[:100],
+            skipped_columns=result.skipped_columns,
+        )
+    shared_cache.set(_import_progress_key(token), progress, IMPORT_PROGRESS_TIMEOUT)
+
+
+def enqueue_import(uploaded_file, owner):
+    """Store an uploaded CSV/XLSX file and import it in the background; returns a progress token."""
+    token = uuid.uuid4().hex
+    name = default_storage.save(f'imports/{token}_{os.path.basename(uploaded_file.name)}', uploaded_file)
+    _store_import_progress(token, 'pending')
+    transaction.on_commit(lambda: submit(run_import, name, owner.id if owner else None, token))
+    return token
+
+
+def run_import(name, owner_id, token):
+    owner = User.objects.filter(id=owner_id).first() if owner_id else None
+    _store_import_progress(token, 'running')
+    try:
+        with default_storage.open(name, 'rb') as fileobj:
+            result = import_leads(
+                read_rows(fileobj, name),
+                owner=owner,
+                progress=lambda result: _store_import_progress(token, 'running', result),
+            )
+    except LeadImportError as e:
+        _store_import_progress(token, 'failed', error=str(e))
+        return
+    except Exception as e:
+        _store_import_progress(token, 'failed', error=str(e))
+        raise
+    finally:
+        default_storage.delete(name)
+    _store_import_progress(token, 'done', result)
+
+
+ANALYTICS_REFRESH_LOCK = 'analytics_data:refreshing'
+
+
+def enqueue_analytics_refresh():
+    """Rebuild the analytics snapshot in the background unless a rebuild is already running."""
+    # The lock expires on its own in case the worker dies before releasing it
+    if shared_cache.add(ANALYTICS_REFRESH_LOCK, True, getattr(settings, 'ANALYTICS_REFRESH_TIMEOUT', 600)):
+        transaction.on_commit(lambda: submit(refresh_analytics_snapshot))
+
+
+def refresh_analytics_snapshot():
+    try:
+        analytics.store_snapshot(analytics.build_snapshot(analytics.load_snapshot()))
+    finally:
+        shared_cache.delete(ANALYTICS_REFRESH_LOCK)
+
+
+RETYPE_BATCH_SIZE = 5000
+
+
+def retype_field_values(template_id):
+    """Recompute the typed columns of every value of a template after its type changed."""
+    field_type = FieldTemplate.objects.filter(id=template_id).values_list('field_type', flat=True).first()
+    if field_type is None:
+        return
+    last_id = 0
+    while True:
+        rows = list(
+            ClientField.objects.filter(template_id=template_id, id__gt=last_id)
+            .order_by('id').only('id', 'value')[:RETYPE_BATCH_SIZE]
+        )
+        if not rows:
+            break
+        for row in rows:
+            for column, parsed in typed_columns(field_type, row.value).items():
+                setattr(row, column, parsed)
+        ClientField.objects.bulk_update(rows, SHADOW_COLUMNS)
+        last_id = rows[-1].id
+    client_data_version.bump()
+
+
+BULK_PROGRESS_TIMEOUT = 86400
+BULK_ACTIONS = ('delete', 'reassign')
+
+
+def _bulk_progress_key(token):
+    return f'bulk_clients:{token}'
+
+
+def bulk_progress(token):
+    return shared_cache.get(_bulk_progress_key(token))
+
+
+def _store_bulk_progress(token, action, status, result=None, error=''):
+    progress = {'action': action, 'status': status, 'error': error, 'total': 0, 'processed': 0}
+    if result is not None:
+        progress.update(total=result.total, processed=result.processed)
+    shared_cache.set(_bulk_progress_key(token), progress, BULK_PROGRESS_TIMEOUT)
+
+
+def enqueue_bulk(action, client_ids=None, owner_id=None, new_owner_id=None):
+    """
+    Delete or reassign (action) the selected clients in the background; returns a progress token.
+
+    Clients are selected by id and/or current owner as in bulk.select_clients();
+    reassigning moves them to new_owner_id.
+    """
+    if action not in BULK_ACTIONS:
+        raise ValueError(f'Unknown bulk action {action!r}')
+    token = uuid.uuid4().hex
+    _store_bulk_progress(token, action, 'pending')
+    transaction.on_commit(lambda: submit(run_bulk, token, action, client_ids, owner_id, new_owner_id))
+    return token
+
+
+def run_bulk(token, action, client_ids, owner_id, new_owner_id):
+    clients = bulk.select_clients(client_ids, owner_id)
+    latest = []
+
+    def progress(result):
+        latest[:] = [result]
+        _store_bulk_progress(token, action, 'running', result)
+
+    _store_bulk_progress(token, action, 'running')
+    try:
+        if action == 'delete':
+            result = bulk.delete_clients(clients, progress=progress)
+        else:
+            result = bulk.reassign_clients(clients, User.objects.get(id=new_owner_id), progress=progress)
+    except Exception as e:
+        # Finished chunks stay committed, so report how far the job got
+        _store_bulk_progress(token, action, 'failed', latest[0] if latest else None, error=str(e))
+        raise
+    _store_bulk_progress(token, action, 'done', result)
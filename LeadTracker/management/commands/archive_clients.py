@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from LeadTracker.archive import archivable_clients, archive_after_days, archive_clients
+from LeadTracker.bulk import DEFAULT_CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = 'Move old and closed clients to the archive tables in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            help=f'Archive clients created more than this many days ago, 0 to skip the age rule '
+                 f'(default LEADTRACKER_ARCHIVE_AFTER_DAYS, {archive_after_days()})',
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the clients that would be archived')
+
+    def handle(self, *args, **options):
+        try:
+            clients = archivable_clients(older_than_days=options['older_than_days'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['dry_run']:
+            self.stdout.write(f'{clients.count()} clients would be archived.')
+            return
+
+        def progress(result):
+            self.stdout.write(f'{result.processed}/{result.total} clients')
+
+        result = archive_clients(clients, chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Archived {result.processed} clients.'))
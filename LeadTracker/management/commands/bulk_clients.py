@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from Custom_user.models import User
+from LeadTracker.bulk import DEFAULT_CHUNK_SIZE, delete_clients, reassign_clients, select_clients
+
+class Command(BaseCommand):
+    help = 'Delete clients or move them to another owner in small chunks, e.g. when an employee leaves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['delete', 'reassign'])
+        parser.add_argument('--owner', help='Only clients created by this username')
+        parser.add_argument('--ids', help='Only these client ids (comma separated)')
+        parser.add_argument('--to', help='Username that receives the clients (reassign)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--noinput', action='store_true', help='Do not ask for confirmation')
+
+    def _user(self, username):
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"User '{username}' does not exist.")
+
+    def handle(self, *args, **options):
+        if not options['owner'] and not options['ids']:
+            raise CommandError('Select clients with --owner and/or --ids.')
+        try:
+            client_ids = [int(part) for part in options['ids'].split(',') if part.strip()] if options['ids'] else None
+        except ValueError:
+            raise CommandError('--ids must be a comma separated list of integers.')
+        owner = self._user(options['owner']) if options['owner'] else None
+        new_owner = None
+        if options['action'] == 'reassign':
+            if not options['to']:
+                raise CommandError('reassign needs --to.')
+            new_owner = self._user(options['to'])
+
+        clients = select_clients(client_ids, owner.id if owner else None)
+        count = clients.count()
+        if not options['noinput']:
+            target = f' to {new_owner.username}' if new_owner else ''
+            if input(f"{options['action'].capitalize()} {count} clients{target}? [y/N] ").strip().lower() != 'y':
+                self.stdout.write('Cancelled.')
+                return
+
+        def progress(result):
+            self.stdout.write(f'{result.processed}/{result.total} clients')
+
+        if new_owner:
+            result = reassign_clients(clients, new_owner, chunk_size=options['chunk_size'], progress=progress)
+            self.stdout.write(self.style.SUCCESS(f'Reassigned {result.processed} clients to {new_owner.username}.'))
+        else:
+            result = delete_clients(clients, chunk_size=options['chunk_size'], progress=progress)
+            self.stdout.write(self.style.SUCCESS(f'Deleted {result.processed} clients.'))
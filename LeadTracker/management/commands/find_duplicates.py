@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from LeadTracker import dedup
+from LeadTracker.models import ClientBlockingKey
+
+class Command(BaseCommand):
+    help = 'Find clusters of clients that share a normalized email, phone number or name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reindex', action='store_true', help='Rebuild all blocking keys first')
+        parser.add_argument(
+            '--kind',
+            action='append',
+            choices=[kind for kind, _ in ClientBlockingKey.KIND_CHOICES],
+            help='Only match on this kind of key (repeatable; default all)',
+        )
+        parser.add_argument(
+            '--max-block-size',
+            type=int,
+            default=50,
+            help='Ignore keys shared by more clients than this (placeholder values)',
+        )
+
+    def handle(self, *args, **options):
+        if options['reindex']:
+            count = dedup.reindex_all()
+            self.stdout.write(f'Indexed {count} clients.')
+
+        clusters = dedup.duplicate_clusters(kinds=options['kind'], max_block_size=options['max_block_size'])
+        clusters.sort(key=lambda cluster: (-len(cluster[0]), cluster[0][0]))
+        for client_ids, kinds in clusters:
+            self.stdout.write(f"{', '.join(sorted(kinds))}: {' '.join(map(str, client_ids))}")
+        duplicates = sum(len(client_ids) - 1 for client_ids, _ in clusters)
+        self.stdout.write(self.style.SUCCESS(
+            f'Found {len(clusters)} duplicate clusters ({duplicates} redundant clients).'
+        ))
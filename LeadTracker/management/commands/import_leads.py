@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from Custom_user.models import User
+from LeadTracker.activity import recorder as activity
+from LeadTracker.importers import DEFAULT_BATCH_SIZE, LeadImportError, import_leads, read_rows
+
+class Command(BaseCommand):
+    help = 'Bulk import leads from a CSV or XLSX file; columns are matched to field templates by name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument('--owner', help="Username that owns rows without a 'Created By' value")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            try:
+                owner = User.objects.get(username=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['owner']}' does not exist.")
+
+        def progress(result):
+            self.stdout.write(f"{result.rows} rows read, {result.created} clients created, {result.error_count} errors")
+
+        with open(options['path'], 'rb') as fileobj:
+            try:
+                result = import_leads(
+                    read_rows(fileobj, options['path']),
+                    owner=owner,
+                    batch_size=options['batch_size'],
+                    progress=progress,
+                )
+            except LeadImportError as e:
+                raise CommandError(str(e))
+            finally:
+                # No middleware flushes the activity buffer of this process
+                activity.flush()
+
+        if result.skipped_columns:
+            self.stdout.write(self.style.WARNING(f"Ignored columns: {', '.join(result.skipped_columns)}"))
+        for row_number, message in result.errors:
+            self.stdout.write(self.style.ERROR(f"Row {row_number}: {message}"))
+        self.stdout.write(self.style.SUCCESS(f'Imported {result.created} clients ({result.error_count} rows rejected).'))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from LeadTracker import rollups
+
+class Command(BaseCommand):
+    help = 'Recompute the hourly, daily and monthly client count rollups from all clients'
+
+    def handle(self, *args, **kwargs):
+        rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt client count rollups.'))
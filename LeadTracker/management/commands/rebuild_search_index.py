@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand, CommandError
+from LeadTracker import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over client field values'
+
+    def handle(self, *args, **kwargs):
+        if not search.rebuild_index():
+            raise CommandError('Full-text search index requires SQLite with FTS5; other databases search with LIKE.')
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt the search index.'))
@@ -0,0 +1,18 @@
+from . import jobs
+from .activity import recorder
+
+
+class ActivityMiddleware:
+    """Feed authenticated requests to the buffered activity recorder."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            recorder.touch(user.id)
+        if recorder.flush_due():
+            jobs.submit(recorder.flush)
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:22
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_client_fields(apps, schema_editor):
+    # Keep the most recently written row for every (client, template) pair
+    ClientField = apps.get_model('LeadTracker', 'ClientField')
+    duplicates = (
+        ClientField.objects
+        .values('client_id', 'template_id')
+        .annotate(keep_id=Max('id'), rows=Count('id'))
+        .filter(rows__gt=1)
+    )
+    for entry in duplicates:
+        ClientField.objects.filter(
+            client_id=entry['client_id'],
+            template_id=entry['template_id'],
+        ).exclude(id=entry['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_client_fields, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='clientfield',
+            constraint=models.UniqueConstraint(fields=('client', 'template'), name='unique_client_template'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0002_clientfield_unique_client_template'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='fieldtemplate',
+            options={'ordering': ['order', 'id']},
+        ),
+        migrations.AddField(
+            model_name='fieldtemplate',
+            name='order',
+            field=models.PositiveIntegerField(default=0, verbose_name='Order'),
+        ),
+    ]
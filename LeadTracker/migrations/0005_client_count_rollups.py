@@ -0,0 +1,84 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour, TruncMonth
+from django.utils.timezone import localtime
+
+
+def backfill_rollups(apps, schema_editor):
+    Client = apps.get_model('LeadTracker', 'Client')
+    truncations = (
+        ('HourlyClientCount', TruncHour('creation_date')),
+        ('DailyClientCount', TruncDate('creation_date')),
+        ('MonthlyClientCount', TruncMonth('creation_date')),
+    )
+    for model_name, truncation in truncations:
+        model = apps.get_model('LeadTracker', model_name)
+        grouped = (
+            Client.objects
+            .annotate(bucket=truncation)
+            .values('created_by', 'bucket')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        rows = []
+        for entry in grouped:
+            bucket = entry['bucket']
+            if model_name == 'MonthlyClientCount' and hasattr(bucket, 'date'):
+                bucket = localtime(bucket).date()
+            rows.append(model(user_id=entry['created_by'], bucket=bucket, count=entry['count']))
+        model.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0004_exportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyClientCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('bucket', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='daily_client_count_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'bucket'), name='unique_daily_client_count')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyClientCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('bucket', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='hourly_client_count_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'bucket'), name='unique_hourly_client_count')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyClientCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('bucket', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='monthly_client_count_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'bucket'), name='unique_monthly_client_count')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
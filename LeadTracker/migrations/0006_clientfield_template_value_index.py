@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0005_client_count_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clientfield',
+            index=models.Index(fields=['template', 'value'], name='clientfield_template_value'),
+        ),
+    ]
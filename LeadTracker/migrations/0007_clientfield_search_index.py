@@ -0,0 +1,67 @@
+from django.db import migrations
+
+# SQLite FTS5 index over ClientField.value. It is an external-content table:
+# the text lives only in LeadTracker_clientfield and the triggers below keep
+# the index in step with every insert, update (including upserts) and delete.
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS "LeadTracker_clientfield_fts" USING fts5(
+        value,
+        content='LeadTracker_clientfield',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "LeadTracker_clientfield_fts_insert"
+    AFTER INSERT ON "LeadTracker_clientfield" BEGIN
+        INSERT INTO "LeadTracker_clientfield_fts" (rowid, value) VALUES (new.id, new.value);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "LeadTracker_clientfield_fts_delete"
+    AFTER DELETE ON "LeadTracker_clientfield" BEGIN
+        INSERT INTO "LeadTracker_clientfield_fts" ("LeadTracker_clientfield_fts", rowid, value)
+        VALUES ('delete', old.id, old.value);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS "LeadTracker_clientfield_fts_update"
+    AFTER UPDATE OF value ON "LeadTracker_clientfield" BEGIN
+        INSERT INTO "LeadTracker_clientfield_fts" ("LeadTracker_clientfield_fts", rowid, value)
+        VALUES ('delete', old.id, old.value);
+        INSERT INTO "LeadTracker_clientfield_fts" (rowid, value) VALUES (new.id, new.value);
+    END
+    """,
+    """
+    INSERT INTO "LeadTracker_clientfield_fts" ("LeadTracker_clientfield_fts") VALUES ('rebuild')
+    """,
+]
+
+DROP_INDEX = [
+    'DROP TRIGGER IF EXISTS "LeadTracker_clientfield_fts_insert"',
+    'DROP TRIGGER IF EXISTS "LeadTracker_clientfield_fts_delete"',
+    'DROP TRIGGER IF EXISTS "LeadTracker_clientfield_fts_update"',
+    'DROP TABLE IF EXISTS "LeadTracker_clientfield_fts"',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        # Other databases fall back to LIKE queries in LeadTracker.search
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0006_clientfield_template_value_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_INDEX), _run(DROP_INDEX)),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0007_clientfield_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientfield',
+            name='value_bool',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='clientfield',
+            name='value_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='clientfield',
+            name='value_number',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='fieldtemplate',
+            name='field_type',
+            field=models.CharField(choices=[('text', 'Text'), ('int', 'Integer'), ('decimal', 'Decimal'), ('date', 'Date'), ('bool', 'Yes/No')], default='text', max_length=10, verbose_name='Field Type'),
+        ),
+        migrations.AddIndex(
+            model_name='clientfield',
+            index=models.Index(fields=['template', 'value_number'], name='clientfield_template_number'),
+        ),
+        migrations.AddIndex(
+            model_name='clientfield',
+            index=models.Index(fields=['template', 'value_date'], name='clientfield_template_date'),
+        ),
+        migrations.AddIndex(
+            model_name='clientfield',
+            index=models.Index(fields=['template', 'value_bool'], name='clientfield_template_bool'),
+        ),
+    ]
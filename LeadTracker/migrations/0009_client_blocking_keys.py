@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0008_typed_field_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientBlockingKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('email', 'Email'), ('phone', 'Phone'), ('name', 'Name')], max_length=10)),
+                ('key', models.CharField(max_length=16)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocking_keys', to='LeadTracker.client')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'key'], name='blocking_kind_key')],
+                'constraints': [models.UniqueConstraint(fields=('client', 'kind', 'key'), name='unique_client_blocking_key')],
+            },
+        ),
+    ]
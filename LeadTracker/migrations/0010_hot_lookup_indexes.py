@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0009_client_blocking_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['created_by', 'creation_date'], name='client_owner_created'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['creation_date'], name='client_creation_date'),
+        ),
+    ]
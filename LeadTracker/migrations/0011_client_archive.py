@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0010_hot_lookup_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='include_archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ArchivedClient',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_clients', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedClientField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(blank=True, max_length=255, verbose_name='Field Value')),
+                ('value_number', models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True)),
+                ('value_date', models.DateField(blank=True, null=True)),
+                ('value_bool', models.BooleanField(blank=True, null=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fields', to='LeadTracker.archivedclient')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='LeadTracker.fieldtemplate')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedclient',
+            index=models.Index(fields=['created_by', 'creation_date'], name='archivedclient_owner_created'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedclientfield',
+            constraint=models.UniqueConstraint(fields=('client', 'template'), name='unique_archived_client_template'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:53
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing clients have no change history; treat them as last changed when created
+    Client = apps.get_model('LeadTracker', 'Client')
+    Client.objects.update(updated_at=F('creation_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0011_client_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.BigIntegerField()),
+                ('owner_id', models.BigIntegerField(blank=True, null=True)),
+                ('reason', models.CharField(choices=[('deleted', 'Deleted'), ('archived', 'Archived')], default='deleted', max_length=10)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['updated_at', 'id'], name='client_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='clienttombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='clienttombstone_deleted'),
+        ),
+    ]
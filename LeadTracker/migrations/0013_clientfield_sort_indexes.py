@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LeadTracker', '0012_client_change_feed'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='clientfield',
+            name='clientfield_template_value',
+        ),
+        migrations.RemoveIndex(
+            model_name='clientfield',
+            name='clientfield_template_number',
+        ),
+        migrations.RemoveIndex(
+            model_name='clientfield',
+            name='clientfield_template_date',
+        ),
+        migrations.RemoveIndex(
+            model_name='clientfield',
+            name='clientfield_template_bool',
+        ),
+        migrations.AddIndex(
+            model_name='clientfield',
+            index=models.Index(fields=['template', 'value', 'client'], name='clientfield_template_value'),
+        ),
+        migrations.AddIndex(
+            model_name='clientfield',
+            index=models.Index(fields=['template', 'value_number', 'client'], name='clientfield_template_number'),
+        ),
+        migrations.AddIndex(
+            model_name='clientfield',
+            index=models.Index(fields=['template', 'value_date', 'client'], name='clientfield_template_date'),
+        ),
+        migrations.AddIndex(
+            model_name='clientfield',
+            index=models.Index(fields=['template', 'value_bool', 'client'], name='clientfield_template_bool'),
+        ),
+    ]
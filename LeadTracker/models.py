@@ -1,28 +1,293 @@
-from django.db import models
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
 from django.conf import settings  # settings.AUTH_USER_MODEL için import
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.timezone import now
+from .signals import client_fields_saved
 
 class FieldTemplate(models.Model):
+    TYPE_TEXT = 'text'
+    TYPE_INT = 'int'
+    TYPE_DECIMAL = 'decimal'
+    TYPE_DATE = 'date'
+    TYPE_BOOL = 'bool'
+    TYPE_CHOICES = [
+        (TYPE_TEXT, 'Text'),
+        (TYPE_INT, 'Integer'),
+        (TYPE_DECIMAL, 'Decimal'),
+        (TYPE_DATE, 'Date'),
+        (TYPE_BOOL, 'Yes/No'),
+    ]
+
     name = models.CharField("Field Name", max_length=100)
+    order = models.PositiveIntegerField("Order", default=0)
+    field_type = models.CharField("Field Type", max_length=10, choices=TYPE_CHOICES, default=TYPE_TEXT)
+
+    class Meta:
+        ordering = ['order', 'id']
 
     def __str__(self):
         return self.name
 
+# Typed templates also store their parsed value in one of these ClientField columns
+TYPED_COLUMNS = {
+    FieldTemplate.TYPE_INT: 'value_number',
+    FieldTemplate.TYPE_DECIMAL: 'value_number',
+    FieldTemplate.TYPE_DATE: 'value_date',
+    FieldTemplate.TYPE_BOOL: 'value_bool',
+}
+SHADOW_COLUMNS = ('value_number', 'value_date', 'value_bool')
+DATE_INPUT_FORMATS = ('%d.%m.%Y', '%d/%m/%Y', '%m/%d/%Y')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+MAX_NUMBER = Decimal('1e14')
+# 1,000 / 12,345,678 (optionally with a .fraction): commas grouping thousands
+THOUSANDS_PATTERN = re.compile(r'^[-+]?\d{1,3}(,\d{3})+(\.\d+)?$')
+
+def format_value(value):
+    """The text stored in ClientField.value for a form or API value."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+def _parse_date(text):
+    try:
+        if (parsed := parse_date(text)) is not None:
+            return parsed
+        if (parsed := parse_datetime(text)) is not None:
+            return parsed.date()
+    except ValueError:
+        return None
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+def _parse_number(text):
+    """
+    Parse a number that may use a comma as the decimal separator.
+
+    Commas grouping thousands are dropped when a decimal point follows
+    ("1,000.5"); without one, "1,000" could mean either and is not parsed.
+    """
+    if ',' in text:
+        if THOUSANDS_PATTERN.match(text):
+            if '.' not in text:
+                return None
+            text = text.replace(',', '')
+        elif '.' in text or text.count(',') > 1:
+            return None
+        else:
+            text = text.replace(',', '.')
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+def typed_columns(field_type, value):
+    """
+    Return {'value_number', 'value_date', 'value_bool'} for a stored text value.
+
+    Only the column matching field_type is set, and only when the text parses
+    as that type; everything else is None.
+    """
+    columns = dict.fromkeys(SHADOW_COLUMNS)
+    text = format_value(value).strip()
+    column = TYPED_COLUMNS.get(field_type)
+    if column is None or not text:
+        return columns
+    if column == 'value_number':
+        number = _parse_number(text)
+        if number is None:
+            return columns
+        if number.is_finite() and abs(number) < MAX_NUMBER and (
+            field_type != FieldTemplate.TYPE_INT or number == number.to_integral_value()
+        ):
+            columns[column] = number
+    elif column == 'value_date':
+        columns[column] = _parse_date(text)
+    elif text.lower() in TRUE_VALUES or text.lower() in FALSE_VALUES:
+        columns[column] = text.lower() in TRUE_VALUES
+    return columns
+
+def field_model_for(model):
+    """The model holding the field values of a client model (ClientField or ArchivedClientField)."""
+    return model._meta.get_field('fields').related_model
+
+class ClientQuerySet(models.QuerySet):
+    def with_field(self, template_id, lookup, value, column='value'):
+        """Clients whose field for template_id matches <column>__<lookup>, as an EXISTS subquery."""
+        matches = field_model_for(self.model).objects.filter(
+            client=OuterRef('pk'), template_id=template_id, **{f'{column}__{lookup}': value}
+        )
+        return self.filter(Exists(matches))
+
 class Client(models.Model):
     creation_date = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='clients')  # Özel kullanıcı modeli
+    # Moved by save(), by field value writes (see handlers.py) and by bulk updates
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ClientQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Per-owner lists and date ranges (dashboard, records API, analytics)
+            models.Index(fields=['created_by', 'creation_date'], name='client_owner_created'),
+            # All-client lists ordered by date (superuser dashboard, time ranges)
+            models.Index(fields=['creation_date'], name='client_creation_date'),
+            # Change feed, walked in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id'], name='client_updated'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the save handlers tell whether a save moved the client without another query
+        loaded = dict(zip(field_names, values))
+        instance._loaded_timing = (loaded.get('created_by_id'), loaded.get('creation_date'))
+        return instance
 
     def __str__(self):
         return f"Client {self.id} (Created by: {self.created_by.username})"
 
+class ClientFieldManager(models.Manager):
+    def value_map(self, client):
+        """Return {template_id: value} for all stored fields of client in one query."""
+        if client.pk is None:
+            return {}
+        return dict(self.filter(client=client).values_list('template_id', 'value'))
+
+    def upsert_values(self, client, values):
+        """
+        Insert or update the given {template_id: value} pairs for client.
+
+        Runs as a single INSERT ... ON CONFLICT statement inside one
+        transaction, so saving a record costs the same whatever the number
+        of templates.
+        """
+        # Imported here because the registry module imports this one
+        from .registry import field_templates
+
+        rows = []
+        for template_id, value in values.items():
+            template = field_templates.get(template_id)
+            text = format_value(value)
+            rows.append(self.model(
+                client=client, template_id=template_id, value=text,
+                **typed_columns(template.field_type if template else None, text),
+            ))
+        if not rows:
+            return
+        with transaction.atomic():
+            self.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['client', 'template'],
+                update_fields=['value', *SHADOW_COLUMNS],
+            )
+        client_fields_saved.send(sender=self.model, client=client, values=values)
+
 class ClientField(models.Model):
     client = models.ForeignKey(Client, related_name='fields', on_delete=models.CASCADE)
     template = models.ForeignKey(FieldTemplate, on_delete=models.CASCADE)
     value = models.CharField("Field Value", max_length=255, blank=True)
+    # Parsed copies of value for typed templates (see typed_columns)
+    value_number = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True)
+    value_date = models.DateField(null=True, blank=True)
+    value_bool = models.BooleanField(null=True, blank=True)
+
+    objects = ClientFieldManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'template'], name='unique_client_template'),
+        ]
+        indexes = [
+            # Field-value filters and sorts look values up per template
+            models.Index(fields=['template', 'value', 'client'], name='clientfield_template_value'),
+            models.Index(fields=['template', 'value_number', 'client'], name='clientfield_template_number'),
+            models.Index(fields=['template', 'value_date', 'client'], name='clientfield_template_date'),
+            models.Index(fields=['template', 'value_bool', 'client'], name='clientfield_template_bool'),
+        ]
+
+    def save(self, *args, **kwargs):
+        for column, parsed in typed_columns(self.template.field_type, self.value).items():
+            setattr(self, column, parsed)
+        if kwargs.get('update_fields') is not None and 'value' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *SHADOW_COLUMNS}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.template.name}: {self.value}"
 
+class ArchivedClient(models.Model):
+    """A client moved out of the hot tables by archive.archive_clients(); keeps its original id."""
+    id = models.BigIntegerField(primary_key=True)
+    creation_date = models.DateTimeField()
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_clients')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ClientQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'creation_date'], name='archivedclient_owner_created'),
+        ]
+
+    def __str__(self):
+        return f"Archived client {self.id} (Created by: {self.created_by.username})"
+
+class ArchivedClientField(models.Model):
+    client = models.ForeignKey(ArchivedClient, related_name='fields', on_delete=models.CASCADE)
+    template = models.ForeignKey(FieldTemplate, on_delete=models.CASCADE)
+    value = models.CharField("Field Value", max_length=255, blank=True)
+    value_number = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True)
+    value_date = models.DateField(null=True, blank=True)
+    value_bool = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        # Cold rows are only read per client, so the per-template value indexes are left out
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'template'], name='unique_archived_client_template'),
+        ]
+
+    def __str__(self):
+        return f"{self.template.name}: {self.value}"
+
+class ClientTombstone(models.Model):
+    """Marks a client that left the Client table, so the change feed can report it."""
+    REASON_DELETED = 'deleted'
+    REASON_ARCHIVED = 'archived'
+    REASON_CHOICES = [
+        (REASON_DELETED, 'Deleted'),
+        (REASON_ARCHIVED, 'Archived'),
+    ]
+
+    client_id = models.BigIntegerField()
+    # A plain id: the owner may be deleted in the same transaction as their clients
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES, default=REASON_DELETED)
+    deleted_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='clienttombstone_deleted'),
+        ]
+
+    def __str__(self):
+        return f"Client {self.client_id} {self.reason} at {self.deleted_at}"
+
 class UserActivity(models.Model):
     user = models.ForeignKey('Custom_user.User', on_delete=models.CASCADE, related_name='activities')
     date = models.DateField(default=now)
@@ -35,4 +300,94 @@ class UserActivity(models.Model):
         verbose_name_plural = 'User Activities'
 
     def __str__(self):
-        return f"{self.user.username} - {self.date}"
\ No newline at end of file
+        return f"{self.user.username} - {self.date}"
+
+class ClientBlockingKey(models.Model):
+    """Hashed, normalized email/phone/name of a client; equal keys mark duplicate candidates."""
+    KIND_EMAIL = 'email'
+    KIND_PHONE = 'phone'
+    KIND_NAME = 'name'
+    KIND_CHOICES = [
+        (KIND_EMAIL, 'Email'),
+        (KIND_PHONE, 'Phone'),
+        (KIND_NAME, 'Name'),
+    ]
+
+    client = models.ForeignKey(Client, related_name='blocking_keys', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=16)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'kind', 'key'], name='unique_client_blocking_key'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'key'], name='blocking_kind_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key} (Client {self.client_id})"
+
+class ExportJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    username = models.CharField("Exported User", max_length=150, blank=True)  # Empty means all records
+    include_archived = models.BooleanField(default=False)
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Export {self.id} ({self.username or 'all records'}) - {self.status}"
+
+
+class ClientCountRollup(models.Model):
+    """Number of clients a user created within one time bucket."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.bucket}: {self.count}"
+
+
+class HourlyClientCount(ClientCountRollup):
+    bucket = models.DateTimeField()  # Start of the hour
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'bucket'], name='unique_hourly_client_count')]
+        indexes = [models.Index(fields=['bucket'], name='hourly_client_count_bucket')]
+
+
+class DailyClientCount(ClientCountRollup):
+    bucket = models.DateField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'bucket'], name='unique_daily_client_count')]
+        indexes = [models.Index(fields=['bucket'], name='daily_client_count_bucket')]
+
+
+class MonthlyClientCount(ClientCountRollup):
+    bucket = models.DateField()  # First day of the month
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'bucket'], name='unique_monthly_client_count')]
+        indexes = [models.Index(fields=['bucket'], name='monthly_client_count_bucket')]
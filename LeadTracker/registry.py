@@ -0,0 +1,109 @@
+"""
+Process-local registry of FieldTemplate rows.
+
+Templates are read on almost every request (forms, dashboard, exports) but
+change very rarely, so each process keeps its own copy and only reloads it
+when the version stamp in the shared cache moves. The stamp is bumped by the
+FieldTemplate save/delete handlers in handlers.py.
+
+The same stamp mechanism tracks client data changes (client_data_version),
+which lets caches of derived artifacts such as exports tell whether they are
+still current. client_removal_version only moves when an existing client
+stops counting where it was counted (deleted, reassigned, archived, its
+owner or creation date edited, its owner deleted), for incremental
+aggregates that can only add new clients.
+"""
+import threading
+import uuid
+from collections import namedtuple
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from .models import FieldTemplate
+
+# Cache alias shared by every process (see CACHES in settings)
+SHARED_CACHE_ALIAS = 'shared'
+VERSION_CACHE_KEY = 'field_templates:version'
+CLIENT_DATA_VERSION_CACHE_KEY = 'clients:version'
+CLIENT_REMOVAL_VERSION_CACHE_KEY = 'clients:removal_version'
+
+shared_cache = ConnectionProxy(caches, SHARED_CACHE_ALIAS)
+
+TemplateEntry = namedtuple('TemplateEntry', ['id', 'name', 'order', 'field_type'])
+
+
+class VersionStamp:
+    """An opaque token in the shared cache that changes whenever bump() is called."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def get(self):
+        """Return the current token, creating one if the cache lost it."""
+        version = shared_cache.get(self.key)
+        if version is None:
+            shared_cache.add(self.key, uuid.uuid4().hex, None)
+            version = shared_cache.get(self.key)
+        return version
+
+    def bump(self):
+        shared_cache.set(self.key, uuid.uuid4().hex, None)
+
+
+class FieldTemplateRegistry:
+    def __init__(self):
+        self._stamp = VersionStamp(VERSION_CACHE_KEY)
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = ()
+        self._by_id = {}
+        self._by_name = {}
+
+    def version(self):
+        return self._stamp.get()
+
+    def invalidate(self):
+        """Move the shared version stamp so every process reloads on next access."""
+        self._stamp.bump()
+
+    def _load(self):
+        version = self.version()
+        if version is not None and version == self._version:
+            return
+        with self._lock:
+            if version is not None and version == self._version:
+                return
+            entries = tuple(
+                TemplateEntry(*row)
+                for row in FieldTemplate.objects.order_by('order', 'id').values_list('id', 'name', 'order', 'field_type')
+            )
+            self._entries = entries
+            self._by_id = {entry.id: entry for entry in entries}
+            self._by_name = {}
+            for entry in entries:
+                self._by_name.setdefault(entry.name.casefold(), entry)
+            self._version = version
+
+    def all(self):
+        """All templates in display order."""
+        self._load()
+        return list(self._entries)
+
+    def ids(self):
+        self._load()
+        return [entry.id for entry in self._entries]
+
+    def get(self, template_id):
+        self._load()
+        return self._by_id.get(template_id)
+
+    def by_name(self, name):
+        """Case-insensitive lookup by template name; returns None when unknown."""
+        self._load()
+        return self._by_name.get(name.strip().casefold())
+
+
+field_templates = FieldTemplateRegistry()
+client_data_version = VersionStamp(CLIENT_DATA_VERSION_CACHE_KEY)
+client_removal_version = VersionStamp(CLIENT_REMOVAL_VERSION_CACHE_KEY)
@@ -0,0 +1,194 @@
+"""
+Per-user hourly, daily and monthly client counts.
+
+The rollup tables are kept current incrementally: the Client save/delete
+receivers (and the bulk write paths) call record() with +1/-1 deltas, so
+chart endpoints read a handful of bucket rows instead of grouping the whole
+Client table. rebuild() recomputes everything from Client for backfills.
+
+cached_totals() keeps the all-user total of every bucket in the shared
+cache. Closed buckets only change when record() touches them, which drops
+their entries in every process, and rebuild() moves the version in the keys.
+They still expire after CLOSED_BUCKET_TIMEOUT, in case a write reached the
+tables some other way. The open (current) bucket gets a short timeout.
+"""
+from collections import Counter
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour, TruncMonth
+from django.utils.timezone import localtime
+
+from .models import ArchivedClient, Client, DailyClientCount, HourlyClientCount, MonthlyClientCount
+from .registry import VersionStamp, shared_cache
+
+REBUILD_BATCH_SIZE = 5000
+OPEN_BUCKET_TIMEOUT = 60
+CLOSED_BUCKET_TIMEOUT = 3600
+
+cache_version = VersionStamp('rollups:version')
+
+
+def hour_bucket(moment):
+    return localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(moment):
+    return localtime(moment).date()
+
+
+def month_bucket(moment):
+    return localtime(moment).date().replace(day=1)
+
+
+# Rollup model -> function mapping a creation datetime to its bucket
+ROLLUPS = (
+    (HourlyClientCount, hour_bucket),
+    (DailyClientCount, day_bucket),
+    (MonthlyClientCount, month_bucket),
+)
+
+
+def _apply_one(model, user_id, bucket, delta):
+    rows = model.objects.filter(user_id=user_id, bucket=bucket)
+    if rows.update(count=F('count') + delta) or delta < 0:
+        # A missing row has nothing to decrement; its user may be mid-deletion
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(user_id=user_id, bucket=bucket, count=delta)
+    except IntegrityError:
+        # Another writer created the row first
+        rows.update(count=F('count') + delta)
+
+
+def _apply_many(model, deltas):
+    # Make sure every incremented row exists, then add all deltas in one UPDATE ... CASE
+    # statement. Decrements only touch rows that exist: the cascade deleting a user
+    # removes their rollup rows before the client delete signals arrive.
+    model.objects.bulk_create(
+        [model(user_id=user_id, bucket=bucket, count=0) for (user_id, bucket), delta in deltas.items() if delta > 0],
+        ignore_conflicts=True,
+    )
+    condition = Q()
+    for user_id, bucket in deltas:
+        condition |= Q(user_id=user_id, bucket=bucket)
+    rows = list(model.objects.filter(condition).only('id', 'user_id', 'bucket'))
+    for row in rows:
+        row.count = F('count') + deltas[(row.user_id, row.bucket)]
+    model.objects.bulk_update(rows, ['count'])
+
+
+def record(events):
+    """
+    Apply (user_id, creation datetime, delta) events to all rollup tables.
+
+    Returns the set of (model, bucket) pairs that changed so callers can
+    drop anything cached for them.
+    """
+    events = list(events)
+    touched = set()
+    if not events:
+        return touched
+    with transaction.atomic():
+        for model, bucket_for in ROLLUPS:
+            deltas = Counter()
+            for user_id, moment, delta in events:
+                deltas[(user_id, bucket_for(moment))] += delta
+            deltas = {key: delta for key, delta in deltas.items() if delta}
+            if len(deltas) == 1:
+                ((user_id, bucket), delta), = deltas.items()
+                _apply_one(model, user_id, bucket, delta)
+            elif deltas:
+                _apply_many(model, deltas)
+            touched.update((model, bucket) for _, bucket in deltas)
+        transaction.on_commit(lambda: forget(touched))
+    return touched
+
+
+def rebuild():
+    """Recompute every rollup table from Client and ArchivedClient."""
+    truncations = {
+        HourlyClientCount: TruncHour('creation_date'),
+        DailyClientCount: TruncDate('creation_date'),
+        MonthlyClientCount: TruncMonth('creation_date'),
+    }
+    with transaction.atomic():
+        for model, truncation in truncations.items():
+            model.objects.all().delete()
+            # Archived clients were created like any other, so they keep counting
+            totals = Counter()
+            for source in (Client, ArchivedClient):
+                grouped = (
+                    source.objects
+                    .annotate(bucket=truncation)
+                    .values('created_by', 'bucket')
+                    .annotate(count=Count('id'))
+                    .order_by()
+                )
+                for entry in grouped.iterator():
+                    bucket = entry['bucket']
+                    if model is MonthlyClientCount and hasattr(bucket, 'date'):
+                        bucket = localtime(bucket).date()
+                    totals[(entry['created_by'], bucket)] += entry['count']
+            rows = [model(user_id=user_id, bucket=bucket, count=count) for (user_id, bucket), count in totals.items()]
+            model.objects.bulk_create(rows, batch_size=REBUILD_BATCH_SIZE)
+        transaction.on_commit(cache_version.bump)
+
+
+def counts(model, start, end=None, user_ids=None, per_user=False):
+    """
+    Sum rollup rows with start <= bucket (< end).
+
+    Returns {bucket: count}, or {(user_id, bucket): count} when per_user.
+    """
+    rows = model.objects.filter(bucket__gte=start)
+    if end is not None:
+        rows = rows.filter(bucket__lt=end)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    group = ('user_id', 'bucket') if per_user else ('bucket',)
+    result = {}
+    for entry in rows.values(*group).annotate(total=Sum('count')).order_by():
+        key = (entry['user_id'], entry['bucket']) if per_user else entry['bucket']
+        result[key] = entry['total']
+    return result
+
+
+def _cache_key(model, bucket, version):
+    # Buckets read back from the database may be in UTC, so key datetimes by timestamp
+    token = int(bucket.timestamp()) if isinstance(bucket, datetime) else bucket.isoformat()
+    return f'rollups:{version}:{model._meta.model_name}:{token}'
+
+
+def forget(touched):
+    """Drop cached totals for (model, bucket) pairs returned by record()."""
+    version = cache_version.get()
+    shared_cache.delete_many([_cache_key(model, bucket, version) for model, bucket in touched])
+
+
+def cached_totals(model, buckets):
+    """
+    Return {bucket: count} summed over all users for the given buckets.
+
+    buckets must be in ascending order with the open bucket last. Only the
+    buckets missing from the cache are read from the database.
+    """
+    version = cache_version.get()
+    keys = {bucket: _cache_key(model, bucket, version) for bucket in buckets}
+    cached = shared_cache.get_many(keys.values())
+    totals = {bucket: cached[key] for bucket, key in keys.items() if key in cached}
+
+    missing = [bucket for bucket in buckets if bucket not in totals]
+    if missing:
+        fetched = counts(model, missing[0])
+        for bucket in missing:
+            totals[bucket] = fetched.get(bucket, 0)
+        current = buckets[-1]
+        closed = {keys[bucket]: totals[bucket] for bucket in missing if bucket != current}
+        if closed:
+            shared_cache.set_many(closed, CLOSED_BUCKET_TIMEOUT)
+        if current in missing:
+            shared_cache.set(keys[current], totals[current], OPEN_BUCKET_TIMEOUT)
+    return totals
@@ -0,0 +1,109 @@
+"""
+Full-text search over client field values.
+
+On SQLite the search runs against the FTS5 index created in migration 0007,
+which triggers keep in sync with LeadTracker_clientfield; results are ranked
+by bm25. Other databases fall back to a case-insensitive LIKE scan.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+
+from .models import ClientField
+
+FTS_TABLE = 'LeadTracker_clientfield_fts'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+# Matching field rows fetched per requested client, so clients that match in
+# several fields still fill the page
+ROWS_PER_CLIENT = 5
+
+_MARK_START, _MARK_END = '\x01', '\x02'
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(text):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted so FTS5 operators and punctuation in the input are
+    treated as plain text. Returns '' when the text has no words.
+    """
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in _TOKEN.findall(text))
+
+
+def highlight_html(marked):
+    """Escape a highlight() result and turn the match markers into <mark> tags."""
+    return escape(marked).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def _fts_rows(expression, owner, limit):
+    owner_join = ''
+    params = [_MARK_START, _MARK_END]
+    if owner is not None:
+        owner_join = 'JOIN "LeadTracker_client" c ON c.id = cf.client_id AND c.created_by_id = %s'
+        params.append(owner.id)
+    params.extend([expression, limit])
+    # FTS5 resolves its hidden column by table name, so the table is not aliased
+    sql = f'''
+        SELECT cf.client_id, cf.template_id, highlight("{FTS_TABLE}", 0, %s, %s), "{FTS_TABLE}".rank
+        FROM "{FTS_TABLE}"
+        JOIN "LeadTracker_clientfield" cf ON cf.id = "{FTS_TABLE}".rowid
+        {owner_join}
+        WHERE "{FTS_TABLE}" MATCH %s
+        ORDER BY "{FTS_TABLE}".rank
+        LIMIT %s
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _like_rows(text, owner, limit):
+    rows = ClientField.objects.filter(value__icontains=text)
+    if owner is not None:
+        rows = rows.filter(client__created_by=owner)
+    pattern = re.compile(re.escape(text), re.IGNORECASE)
+    return [
+        (client_id, template_id, pattern.sub(lambda m: f'{_MARK_START}{m.group(0)}{_MARK_END}', value), 0.0)
+        for client_id, template_id, value in rows.order_by('-client_id').values_list('client_id', 'template_id', 'value')[:limit]
+    ]
+
+
+def search_clients(text, owner=None, limit=DEFAULT_LIMIT):
+    """
+    Return up to limit [{'client_id', 'score', 'matches': [(template_id, highlight_html)]}].
+
+    Clients are ordered by their best matching field (lower bm25 scores are
+    better). With an owner only that user's clients are searched.
+    """
+    text = text.strip()
+    if fts_available():
+        expression = match_expression(text)
+        rows = _fts_rows(expression, owner, limit * ROWS_PER_CLIENT) if expression else []
+    else:
+        rows = _like_rows(text, owner, limit * ROWS_PER_CLIENT) if text else []
+
+    results = {}
+    for client_id, template_id, marked, rank in rows:
+        if client_id not in results:
+            if len(results) >= limit:
+                continue
+            results[client_id] = {'client_id': client_id, 'score': rank, 'matches': []}
+        results[client_id]['matches'].append((template_id, highlight_html(marked)))
+    return list(results.values())
+
+
+def rebuild_index():
+    """Rebuild the FTS5 index from LeadTracker_clientfield and merge its segments."""
+    if not fts_available():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}") VALUES (\'rebuild\')')
+        cursor.execute(f'INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}") VALUES (\'optimize\')')
+    return True
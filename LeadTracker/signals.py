@@ -0,0 +1,29 @@
+"""
+Custom signals sent by LeadTracker.
+
+Bulk write paths (bulk_create, queryset.update) bypass the model save/delete
+signals, so they send these instead. Receivers live in handlers.py.
+"""
+from django.dispatch import Signal
+
+# Sent after ClientField.objects.upsert_values() wrote values for a client.
+# Arguments: client, values ({template_id: value})
+client_fields_saved = Signal()
+
+# Sent after a batch of clients and their field values was inserted with
+# bulk_create (e.g. by the lead importer). Arguments: clients
+clients_imported = Signal()
+
+# Sent inside the transaction of each chunk deleted by bulk.delete_clients(),
+# which removes rows without the per-row delete signals. Arguments: clients
+# (Client instances with id, created_by_id and creation_date loaded)
+clients_deleted = Signal()
+
+# Sent inside the transaction of each chunk reassigned by
+# bulk.reassign_clients(). Arguments: clients (as above, with their previous
+# owner), owner (the new owner)
+clients_reassigned = Signal()
+
+# Sent inside the transaction of each chunk moved to the archive tables by
+# archive.archive_clients(). Arguments: clients (as for clients_deleted)
+clients_archived = Signal()
@@ -1,3 +1,602 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import re
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from Custom_user.models import User
+
+from . import admin as client_admin
+from .activity import ActivityRecorder
+from .analytics import build_snapshot
+from .archive import archivable_clients, archive_clients
+from .bulk import delete_clients, reassign_clients, select_clients
+from .dedup import client_keys, duplicate_clusters, find_matches
+from .exports import write_xlsx
+from .grid import encode_cursor
+from .importers import LeadImportError, import_leads, read_rows
+from .jobs import enqueue_export, run_export_job
+from .models import (
+    ArchivedClient, ArchivedClientField, Client, ClientBlockingKey, ClientField, DailyClientCount, ExportJob, FieldTemplate,
+    HourlyClientCount, MonthlyClientCount, UserActivity, typed_columns,
+)
+from .registry import field_templates as field_registry, shared_cache
+from .rollups import cached_totals, counts, day_bucket, rebuild
+from .search import search_clients
+from .timeindex import creation_times
+
+# A plan step that reads a whole table without any index
+FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)(\S+)$')
+
+
+class QueryPlanAssertions:
+    """Fail when a query's SQLite plan degrades to a full table scan."""
+
+    def query_plan(self, queryset):
+        return [line.split(' ', 3)[-1] for line in queryset.explain().splitlines()]
+
+    def assertNoFullScan(self, queryset):
+        plan = self.query_plan(queryset)
+        scans = [step for step in plan if FULL_SCAN.search(step)]
+        self.assertEqual(scans, [], 'Full table scan in plan:\n' + '\n'.join(plan))
+
+    def assertSearches(self, queryset, table):
+        """The table is read through an index lookup, not walked."""
+        self.assertNoFullScan(queryset)
+        plan = self.query_plan(queryset)
+        self.assertTrue(
+            any(re.match(rf'SEARCH {re.escape(table)} ', step) for step in plan),
+            f'{table} is not searched by index:\n' + '\n'.join(plan),
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class HotLookupPlanTests(QueryPlanAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        cls.template = FieldTemplate.objects.create(name='Email', order=1)
+        cls.now = timezone.now()
+
+    def test_owner_clients_in_date_range(self):
+        clients = Client.objects.filter(
+            created_by=self.user,
+            creation_date__gte=self.now - timedelta(days=30),
+            creation_date__lt=self.now,
+        )
+        self.assertSearches(clients, 'LeadTracker_client')
+
+    def test_owner_clients_newest_first(self):
+        clients = Client.objects.filter(created_by=self.user).order_by('-creation_date', '-id')[:50]
+        self.assertSearches(clients, 'LeadTracker_client')
+
+    def test_all_clients_newest_first(self):
+        self.assertNoFullScan(Client.objects.order_by('-creation_date', '-id')[:50])
+
+    def test_field_values_for_page(self):
+        rows = ClientField.objects.filter(client_id__in=[1, 2, 3]).values_list('client_id', 'template_id', 'value')
+        self.assertSearches(rows, 'LeadTracker_clientfield')
+
+    def test_field_value_by_client_and_template(self):
+        self.assertSearches(ClientField.objects.filter(client_id=1, template=self.template), 'LeadTracker_clientfield')
+
+    def test_owner_clients_filtered_by_field(self):
+        clients = Client.objects.filter(created_by=self.user).with_field(self.template.id, 'exact', 'a@b.com')
+        self.assertSearches(clients, 'LeadTracker_client')
+
+    def test_field_value_lookup(self):
+        rows = ClientField.objects.filter(template=self.template, value='a@b.com')
+        self.assertSearches(rows, 'LeadTracker_clientfield')
+
+    def test_field_sorted_page(self):
+        rows = (
+            ClientField.objects.filter(template=self.template, value__gte='m')
+            .filter(Q(value__gt='m') | Q(client_id__gt=5))
+            .order_by('value', 'client_id').values_list('value', 'client_id')[:51]
+        )
+        self.assertSearches(rows, 'LeadTracker_clientfield')
+        self.assertFalse([step for step in self.query_plan(rows) if 'TEMP B-TREE' in step])
+
+    def test_rollup_range(self):
+        start = self.now - timedelta(days=7)
+        self.assertSearches(HourlyClientCount.objects.filter(bucket__gte=start, bucket__lt=self.now), 'LeadTracker_hourlyclientcount')
+        daily = DailyClientCount.objects.filter(bucket__gte=start.date(), user_id__in=[self.user.id])
+        self.assertSearches(daily, 'LeadTracker_dailyclientcount')
+
+    def test_blocking_key_lookup(self):
+        keys = ClientBlockingKey.objects.filter(kind=ClientBlockingKey.KIND_EMAIL, key='0123456789abcdef')
+        self.assertSearches(keys, 'LeadTracker_clientblockingkey')
+
+
+class UserDeletionTests(TestCase):
+    def test_delete_user_who_owns_clients(self):
+        user = User.objects.create_user(username='leaver', email='leaver@example.com', password='pw')
+        keeper = User.objects.create_user(username='keeper', email='keeper@example.com', password='pw')
+        for owner in (user, user, user, keeper):
+            Client.objects.create(created_by=owner)
+
+        user.delete()
+
+        self.assertFalse(Client.objects.filter(created_by_id=user.id).exists())
+        for model in (HourlyClientCount, DailyClientCount):
+            self.assertFalse(model.objects.filter(user_id=user.id).exists())
+            self.assertEqual(sum(model.objects.filter(user=keeper).values_list('count', flat=True)), 1)
+
+
+class RecordCursorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='pw')
+        for _ in range(3):
+            Client.objects.create(created_by=self.user)
+        self.client.force_login(self.user)
+
+    def test_cursor_walks_every_record(self):
+        ids, cursor = [], None
+        while True:
+            params = {'limit': 1, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(reverse('get_user_records'), params).json()
+            ids += [record['id'] for record in data['records']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(sorted(ids), list(Client.objects.values_list('id', flat=True).order_by('id')))
+
+    def test_crafted_cursor_is_rejected(self):
+        for parts in (('next', 'garbage', 1), ('next', None, 1), ('next', '2024-01-01 00:00:00', 'x')):
+            response = self.client.get(reverse('get_user_records'), {'cursor': encode_cursor(*parts)})
+            self.assertEqual(response.status_code, 400, parts)
+
+
+class TypedColumnsTests(TestCase):
+    def test_comma_numbers(self):
+        cases = {'3,5': Decimal('3.5'), '1,000.5': Decimal('1000.5'), '10,000': None, '1,000': None, '1.000,5': None}
+        for text, expected in cases.items():
+            self.assertEqual(typed_columns(FieldTemplate.TYPE_DECIMAL, text)['value_number'], expected, text)
+
+
+@override_settings(ACTIVITY_TRACKING=True)
+class ActivityFlushTests(TestCase):
+    def test_failed_flush_keeps_counters(self):
+        user = User.objects.create_user(username='worker', email='worker@example.com', password='pw')
+        day = timezone.localdate()
+        recorder = ActivityRecorder()
+        recorder.add_records(user.id, day, 3)
+
+        with mock.patch.object(UserActivity.objects, 'bulk_update', side_effect=DatabaseError('down')):
+            with self.assertRaises(DatabaseError):
+                recorder.flush()
+        recorder.flush()
+
+        self.assertEqual(UserActivity.objects.get(user=user, date=day).record_count, 3)
+
+    def test_rolled_back_create_is_not_counted(self):
+        user = User.objects.create_user(username='worker', email='worker@example.com', password='pw')
+        recorder = ActivityRecorder()
+        with mock.patch('LeadTracker.handlers.activity', recorder), self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                Client.objects.create(created_by=user)
+                raise DatabaseError('rolled back')
+            Client.objects.create(created_by=user)
+        recorder.flush()
+
+        self.assertEqual(UserActivity.objects.get(user=user).record_count, 1)
+
+
+class AnalyticsSnapshotTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.clients = [Client.objects.create(created_by=self.owner) for _ in range(3)]
+
+    def totals(self, snapshot):
+        return {entry['employee']['username']: entry['total_records'] for entry in snapshot['employees']}
+
+    def test_incremental_build_sees_new_clients(self):
+        snapshot = build_snapshot()
+        Client.objects.create(created_by=self.other)
+        self.assertEqual(self.totals(build_snapshot(snapshot)), {'owner': 3, 'other': 1})
+
+    def test_incremental_build_after_delete_and_reassign(self):
+        snapshot = build_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clients[0].delete()
+            reassign_clients(Client.objects.filter(id=self.clients[1].id), self.other)
+        self.assertEqual(self.totals(build_snapshot(snapshot)), {'owner': 1, 'other': 1})
+
+
+class CreationTimeInvalidationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.client_id = Client.objects.create(created_by=self.owner).id
+
+    def test_plain_save_keeps_index(self):
+        client = Client.objects.get(pk=self.client_id)
+        with mock.patch.object(creation_times, 'invalidate') as invalidate:
+            client.save()
+        invalidate.assert_not_called()
+
+    def test_owner_change_invalidates_index(self):
+        client = Client.objects.get(pk=self.client_id)
+        client.created_by = self.other
+        with mock.patch.object(creation_times, 'invalidate') as invalidate:
+            client.save()
+        invalidate.assert_called_once()
+
+
+class UpsertValuesTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.amount = FieldTemplate.objects.create(name='Amount', field_type=FieldTemplate.TYPE_INT)
+            self.city = FieldTemplate.objects.create(name='City')
+        self.lead = Client.objects.create(created_by=owner)
+
+    def test_inserts_then_updates_in_place(self):
+        ClientField.objects.upsert_values(self.lead, {self.amount.id: 5, self.city.id: 'Ankara'})
+        ClientField.objects.upsert_values(self.lead, {self.amount.id: '7'})
+
+        self.assertEqual(ClientField.objects.value_map(self.lead), {self.amount.id: '7', self.city.id: 'Ankara'})
+        self.assertEqual(ClientField.objects.filter(client=self.lead).count(), 2)
+        self.assertEqual(ClientField.objects.get(client=self.lead, template=self.amount).value_number, 7)
+
+    def test_unparsable_typed_value_keeps_text_only(self):
+        ClientField.objects.upsert_values(self.lead, {self.amount.id: 5})
+        ClientField.objects.upsert_values(self.lead, {self.amount.id: 'n/a'})
+
+        field = ClientField.objects.get(client=self.lead, template=self.amount)
+        self.assertEqual((field.value, field.value_number), ('n/a', None))
+
+
+class ExcelExportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city = FieldTemplate.objects.create(name='City', order=1)
+            self.phone = FieldTemplate.objects.create(name='Phone', order=2)
+        self.leads = [Client.objects.create(created_by=self.owner) for _ in range(3)]
+        ClientField.objects.upsert_values(self.leads[0], {self.city.id: 'Izmir', self.phone.id: '555'})
+        ClientField.objects.upsert_values(self.leads[1], {self.phone.id: '556'})
+
+    def read_export(self, **kwargs):
+        buffer = io.BytesIO()
+        write_xlsx(buffer, Client.objects.all(), field_registry.all(), **kwargs)
+        buffer.seek(0)
+        return [list(row) for row in load_workbook(buffer, read_only=True).active.iter_rows(values_only=True)]
+
+    def test_one_column_per_template(self):
+        rows = self.read_export()
+        self.assertEqual(rows[0], ['ID', 'Created By', 'Creation Date', 'City', 'Phone'])
+        self.assertEqual(rows[1][:2] + rows[1][3:], [self.leads[0].id, 'owner', 'Izmir', '555'])
+
+    def test_missing_values_and_chunk_boundaries(self):
+        rows = self.read_export(chunk_size=1)
+        self.assertEqual([row[0] for row in rows[1:]], [lead.id for lead in self.leads])
+        self.assertIsNone(rows[2][3])
+        self.assertEqual(rows[2][4], '556')
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city = FieldTemplate.objects.create(name='City')
+        self.lead = Client.objects.create(created_by=self.owner)
+        ClientField.objects.upsert_values(self.lead, {self.city.id: 'Bursa, Nilufer'})
+        Client.objects.create(created_by=other)
+        self.client.force_login(self.owner)
+
+    def test_csv_streams_own_clients(self):
+        response = self.client.get(reverse('export_to_csv'), {'username': 'owner'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['ID', 'Created By', 'Creation Date', 'City'])
+        self.assertEqual([(row[0], row[1], row[3]) for row in rows[1:]], [(str(self.lead.id), 'owner', 'Bursa, Nilufer')])
+
+    def test_ndjson_has_one_object_per_client(self):
+        response = self.client.get(reverse('export_to_ndjson'), {'username': 'owner'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(record['id'], record['fields']) for record in records], [(self.lead.id, {'City': 'Bursa, Nilufer'})])
+
+    def test_other_users_records_are_forbidden(self):
+        for name in ('export_to_csv', 'export_to_ndjson', 'export_to_excel'):
+            self.assertEqual(self.client.get(reverse(name), {'username': 'other'}).status_code, 403, name)
+            self.assertEqual(self.client.get(reverse(name)).status_code, 403, name)
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        Client.objects.create(created_by=self.owner)
+
+    def test_unchanged_data_reuses_job_and_artifact(self):
+        job = enqueue_export('owner')
+        self.assertEqual(enqueue_export('owner').id, job.id)
+
+        run_export_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_DONE)
+        self.assertTrue(job.file.storage.exists(job.file.name))
+        self.assertEqual(enqueue_export('owner').id, job.id)
+
+    def test_write_after_export_starts_new_job(self):
+        job = enqueue_export('owner')
+        run_export_job(job.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(created_by=self.owner)
+
+        fresh = enqueue_export('owner')
+        self.assertNotEqual(fresh.id, job.id)
+        self.assertNotEqual(fresh.fingerprint, job.fingerprint)
+
+
+class LeadImportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city = FieldTemplate.objects.create(name='City')
+            self.amount = FieldTemplate.objects.create(name='Amount', field_type=FieldTemplate.TYPE_INT)
+
+    def import_csv(self, text, **kwargs):
+        return import_leads(read_rows(io.BytesIO(text.encode()), 'leads.csv'), **kwargs)
+
+    def test_rows_become_clients_with_typed_values(self):
+        result = self.import_csv(
+            'ID,Created By,city,Amount,Colour\n1,owner,Ankara,12,red\n,,Izmir,,\n\n3,ghost,Bursa,1,\n',
+            owner=self.owner, batch_size=1,
+        )
+
+        self.assertEqual((result.rows, result.created, result.skipped_columns), (3, 2, ['Colour']))
+        self.assertEqual(result.errors, [(5, "Unknown user 'ghost'.")])
+        leads = list(Client.objects.filter(created_by=self.owner).order_by('id'))
+        self.assertEqual([ClientField.objects.value_map(lead) for lead in leads], [
+            {self.city.id: 'Ankara', self.amount.id: '12'},
+            {self.city.id: 'Izmir', self.amount.id: ''},
+        ])
+        self.assertEqual(ClientField.objects.get(client=leads[0], template=self.amount).value_number, 12)
+
+    def test_header_without_known_columns_is_rejected(self):
+        with self.assertRaises(LeadImportError):
+            self.import_csv('Colour,Size\nred,L\n', owner=self.owner)
+        self.assertFalse(Client.objects.exists())
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        shared_cache.clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leads = [Client.objects.create(created_by=self.owner) for _ in range(3)]
+            Client.objects.create(created_by=self.other)
+        self.today = day_bucket(self.leads[0].creation_date)
+
+    def rows(self):
+        return {
+            model: sorted(model.objects.values_list('user_id', 'bucket', 'count'))
+            for model in (HourlyClientCount, DailyClientCount, MonthlyClientCount)
+        }
+
+    def test_counts_follow_creates_and_deletes(self):
+        per_user = counts(DailyClientCount, self.today, per_user=True)
+        self.assertEqual(per_user, {(self.owner.id, self.today): 3, (self.other.id, self.today): 1})
+        self.assertEqual(cached_totals(DailyClientCount, [self.today]), {self.today: 4})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leads[0].delete()
+
+        self.assertEqual(counts(DailyClientCount, self.today, user_ids=[self.owner.id]), {self.today: 2})
+        self.assertEqual(cached_totals(DailyClientCount, [self.today]), {self.today: 3})
+
+    def test_rebuild_matches_incremental_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leads[0].delete()
+        incremental = self.rows()
+        rebuild()
+        self.assertEqual(self.rows(), incremental)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.note = FieldTemplate.objects.create(name='Note')
+        self.lead = Client.objects.create(created_by=self.owner)
+        ClientField.objects.upsert_values(self.lead, {self.note.id: 'Wants <b>solar</b> panels'})
+        ClientField.objects.upsert_values(Client.objects.create(created_by=self.other), {self.note.id: 'Solar roof'})
+
+    def test_prefix_match_is_highlighted_and_escaped(self):
+        results = search_clients('pan', owner=self.owner)
+        self.assertEqual([result['client_id'] for result in results], [self.lead.id])
+        self.assertEqual(results[0]['matches'], [(self.note.id, 'Wants &lt;b&gt;solar&lt;/b&gt; <mark>panels</mark>')])
+        self.assertEqual(len(search_clients('solar')), 2)
+
+    def test_edited_value_replaces_old_terms(self):
+        ClientField.objects.upsert_values(self.lead, {self.note.id: 'Wants heat pumps'})
+        self.assertEqual(search_clients('panels'), [])
+        self.assertEqual([result['client_id'] for result in search_clients('heat pump')], [self.lead.id])
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.email = FieldTemplate.objects.create(name='E-mail')
+            self.phone = FieldTemplate.objects.create(name='Phone')
+        self.leads = [Client.objects.create(created_by=owner) for _ in range(4)]
+        ClientField.objects.upsert_values(self.leads[0], {self.email.id: 'Ada+crm@Example.com '})
+        ClientField.objects.upsert_values(self.leads[1], {self.email.id: 'ada@example.com', self.phone.id: '+90 532 111 22 33'})
+        ClientField.objects.upsert_values(self.leads[2], {self.phone.id: '(0532) 1112233'})
+        ClientField.objects.upsert_values(self.leads[3], {self.email.id: 'grace@example.com'})
+
+    def test_normalized_keys_match_and_cluster_transitively(self):
+        matches = find_matches(client_keys({self.email.id: 'ADA@example.com'}))
+        email, phone = ClientBlockingKey.KIND_EMAIL, ClientBlockingKey.KIND_PHONE
+        self.assertEqual(matches, {self.leads[1].id: [email], self.leads[0].id: [email]})
+        self.assertEqual(duplicate_clusters(), [([lead.id for lead in self.leads[:3]], {email, phone})])
+
+    def test_edited_value_leaves_cluster_and_large_blocks_are_skipped(self):
+        ClientField.objects.upsert_values(self.leads[2], {self.phone.id: '0212 999 00 00'})
+        self.assertEqual(duplicate_clusters(), [([self.leads[0].id, self.leads[1].id], {ClientBlockingKey.KIND_EMAIL})])
+        self.assertEqual(duplicate_clusters(max_block_size=1), [])
+
+
+@override_settings(LEADTRACKER_BULK_PAUSE=0)
+class BulkOperationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city = FieldTemplate.objects.create(name='City')
+        self.leads = [Client.objects.create(created_by=self.owner) for _ in range(5)]
+        for lead in self.leads:
+            ClientField.objects.upsert_values(lead, {self.city.id: 'Adana'})
+        self.kept = Client.objects.create(created_by=self.other)
+        self.today = day_bucket(self.kept.creation_date)
+
+    def daily(self):
+        return counts(DailyClientCount, self.today, per_user=True)
+
+    def test_delete_in_chunks(self):
+        processed = []
+        progress = lambda result: processed.append(result.processed)
+        result = delete_clients(select_clients(owner_id=self.owner.id), chunk_size=2, progress=progress)
+
+        self.assertEqual((result.total, processed), (5, [2, 4, 5]))
+        self.assertEqual(list(Client.objects.values_list('id', flat=True)), [self.kept.id])
+        self.assertFalse(ClientField.objects.exists())
+        self.assertEqual(self.daily(), {(self.owner.id, self.today): 0, (self.other.id, self.today): 1})
+
+    def test_reassign_skips_clients_already_owned(self):
+        chosen = [lead.id for lead in self.leads[:3]] + [self.kept.id]
+        result = reassign_clients(select_clients(client_ids=chosen), self.other, chunk_size=2)
+
+        self.assertEqual((result.total, result.processed), (3, 3))
+        self.assertEqual(Client.objects.filter(created_by=self.other).count(), 4)
+        self.assertEqual(self.daily(), {(self.owner.id, self.today): 2, (self.other.id, self.today): 4})
+
+
+@override_settings(LEADTRACKER_BULK_PAUSE=0)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.status = FieldTemplate.objects.create(name='Status')
+        self.old, self.won, self.open = [Client.objects.create(created_by=self.user) for _ in range(3)]
+        Client.objects.filter(id=self.old.id).update(creation_date=timezone.now() - timedelta(days=400))
+        ClientField.objects.upsert_values(self.won, {self.status.id: 'Won'})
+        ClientField.objects.upsert_values(self.open, {self.status.id: 'Open'})
+        self.client.force_login(self.user)
+
+    def record_ids(self, **params):
+        ids, cursor = [], None
+        while True:
+            data = self.client.get(reverse('get_user_records'), {**params, **({'cursor': cursor} if cursor else {})}).json()
+            ids += [(record['id'], record['archived']) for record in data['records']]
+            if not (cursor := data['next_cursor']):
+                return sorted(ids)
+
+    def test_old_and_closed_clients_move_to_archive(self):
+        rollups_before = sorted(DailyClientCount.objects.values_list('user_id', 'bucket', 'count'))
+        due = archivable_clients(older_than_days=365, states={'Status': ['Won', 'Lost']})
+        result = archive_clients(due, chunk_size=1)
+
+        self.assertEqual(result.processed, 2)
+        self.assertEqual(list(Client.objects.values_list('id', flat=True)), [self.open.id])
+        self.assertEqual(sorted(ArchivedClient.objects.values_list('id', flat=True)), [self.old.id, self.won.id])
+        self.assertEqual(list(ArchivedClientField.objects.values_list('client_id', 'value')), [(self.won.id, 'Won')])
+        self.assertEqual(sorted(DailyClientCount.objects.values_list('user_id', 'bucket', 'count')), rollups_before)
+
+    def test_records_include_archived_only_when_asked(self):
+        archive_clients(archivable_clients(older_than_days=365, states={}))
+
+        self.assertEqual(self.record_ids(limit=1), [(self.won.id, False), (self.open.id, False)])
+        self.assertEqual(
+            self.record_ids(limit=1, include_archived=1),
+            [(self.old.id, True), (self.won.id, False), (self.open.id, False)],
+        )
+
+
+class ClientAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.status = FieldTemplate.objects.create(name='Status')
+        self.leads = [Client.objects.create(created_by=self.user) for _ in range(3)]
+        ClientField.objects.upsert_values(self.leads[0], {self.status.id: 'Won'})
+        ClientField.objects.upsert_values(self.leads[1], {self.status.id: 'Lost'})
+        self.client.force_login(self.user)
+        self.url = reverse('admin:LeadTracker_client_changelist')
+
+    def test_changelist_filters_on_field_values(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, '<strong>Status:</strong> Won', html=False)
+        self.assertContains(response, f'field_{self.status.id}=Lost')
+
+        response = self.client.get(self.url, {f'field_{self.status.id}': 'Won'})
+        self.assertEqual([lead.id for lead in response.context['cl'].result_list], [self.leads[0].id])
+
+    def test_large_tables_get_estimated_counts_and_no_wide_filters(self):
+        with mock.patch.object(client_admin, 'ADMIN_EXACT_COUNT_LIMIT', 1):
+            paginator = client_admin.EstimatedCountPaginator(Client.objects.order_by('id'), 2)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(paginator.count, 3)
+            self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+            filtered = client_admin.EstimatedCountPaginator(Client.objects.filter(id=self.leads[0].id), 2)
+            self.assertEqual(filtered.count, 1)
+
+        cache.clear()
+        with mock.patch.object(client_admin, 'ADMIN_FILTER_MAX_CHOICES', 1):
+            self.assertIsNone(client_admin.field_choices(self.status))
+
+
+@override_settings(LEADTRACKER_CHANGE_FEED_SETTLE_SECONDS=-60)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city = FieldTemplate.objects.create(name='City')
+        self.kept, self.removed = [Client.objects.create(created_by=self.user) for _ in range(2)]
+        self.client.force_login(self.user)
+
+    def feed(self, cursor=None):
+        return self.client.get(reverse('record_changes'), {'cursor': cursor} if cursor else {}).json()
+
+    def ops(self, data):
+        return [(change['op'], change['id']) for change in data['changes']]
+
+    def test_edits_and_deletes_after_cursor(self):
+        kept_id, removed_id = self.kept.id, self.removed.id
+        first = self.feed()
+        self.assertEqual(self.ops(first), [('insert', kept_id), ('insert', removed_id)])
+
+        ClientField.objects.upsert_values(self.kept, {self.city.id: 'Konya'})
+        self.removed.delete()
+        second = self.feed(first['next_cursor'])
+
+        self.assertEqual(self.ops(second), [('update', kept_id), ('delete', removed_id)])
+        self.assertEqual(second['changes'][0]['details'], [{'field_name': 'City', 'field_value': 'Konya'}])
+        self.assertEqual(self.feed(second['next_cursor'])['changes'], [])
+
+    @override_settings(LEADTRACKER_CHANGE_FEED_SETTLE_SECONDS=60)
+    def test_recent_changes_wait_for_the_settle_window(self):
+        data = self.feed()
+        self.assertEqual((data['changes'], data['has_more']), ([], False))
@@ -0,0 +1,127 @@
+"""
+Process-local, array-backed index of client creation times.
+
+Each user gets one sorted int64 NumPy array of creation timestamps (epoch
+microseconds), so counting a range or building a histogram for any set of users
+is a couple of searchsorted() calls instead of a query.
+
+The index follows the registry's approach to staying current: it only looks
+at the database when client_data_version has moved, and then only loads the
+clients with an id above the highest one it has seen. Archived clients are
+indexed as well, since they still count as created leads. Deleting a client or
+changing its owner or creation date moves a separate stamp, which makes the
+next access rebuild the index from scratch.
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from .models import ArchivedClient, Client
+from .registry import VersionStamp, client_data_version
+
+REBUILD_STAMP_KEY = 'creation_time_index:version'
+LOAD_CHUNK_SIZE = 50000
+
+_EMPTY = np.empty(0, dtype=np.int64)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def epoch(moment):
+    """Exact epoch microseconds of an aware datetime."""
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+class CreationTimeIndex:
+    def __init__(self):
+        self._rebuild_stamp = VersionStamp(REBUILD_STAMP_KEY)
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._rebuild_version = None
+        self._max_id = 0
+        self._times = {}
+
+    def invalidate(self):
+        """Force every process to rebuild the index on next access."""
+        self._rebuild_stamp.bump()
+
+    def _load_rows(self, model, after_id, columns):
+        """Add the creation times of model rows with id > after_id to columns; returns the highest id."""
+        max_id = after_id
+        while True:
+            rows = list(
+                model.objects.filter(id__gt=max_id).order_by('id')
+                .values_list('id', 'created_by', 'creation_date')[:LOAD_CHUNK_SIZE]
+            )
+            for _, user_id, created in rows:
+                columns.setdefault(user_id, []).append(epoch(created))
+            if rows:
+                max_id = rows[-1][0]
+            if len(rows) < LOAD_CHUNK_SIZE:
+                return max_id
+
+    def _load(self, after_id, full=False):
+        """
+        Return ({user_id: unsorted int64 array}, highest id) for clients with id > after_id.
+
+        A full load includes archived clients; they only ever leave the hot
+        table, so incremental loads never need them.
+        """
+        columns = {}
+        if full:
+            self._load_rows(ArchivedClient, 0, columns)
+        max_id = self._load_rows(Client, after_id, columns)
+        return {user_id: np.array(times, dtype=np.int64) for user_id, times in columns.items()}, max_id
+
+    def refresh(self):
+        rebuild_version = self._rebuild_stamp.get()
+        data_version = client_data_version.get()
+        if rebuild_version == self._rebuild_version and data_version == self._data_version:
+            return
+        with self._lock:
+            if rebuild_version == self._rebuild_version and data_version == self._data_version:
+                return
+            full = rebuild_version != self._rebuild_version
+            if full:
+                times, after_id = {}, 0
+            else:
+                times, after_id = dict(self._times), self._max_id
+            added, max_id = self._load(after_id, full=full)
+            for user_id, new in added.items():
+                times[user_id] = np.sort(np.concatenate((times.get(user_id, _EMPTY), new)), kind='stable')
+            # Readers keep using the old dict until this assignment
+            self._times = times
+            self._max_id = max_id
+            self._rebuild_version = rebuild_version
+            self._data_version = data_version
+
+    def _arrays(self, user_ids):
+        self.refresh()
+        times = self._times
+        if user_ids is None:
+            return times
+        return {user_id: times.get(user_id, _EMPTY) for user_id in user_ids}
+
+    def counts(self, start, end, user_ids=None):
+        """{user_id: clients created in [start, end)} for user_ids (all indexed users when None)."""
+        bounds = np.array([epoch(start), epoch(end)], dtype=np.int64)
+        return {
+            user_id: int(np.diff(np.searchsorted(times, bounds))[0])
+            for user_id, times in self._arrays(user_ids).items()
+        }
+
+    def histogram(self, edges, user_ids=None):
+        """
+        {user_id: counts per bin} for ascending datetime edges.
+
+        Bin i counts clients created in [edges[i], edges[i + 1]).
+        """
+        bounds = np.array([epoch(edge) for edge in edges], dtype=np.int64)
+        return {
+            user_id: np.diff(np.searchsorted(times, bounds))
+            for user_id, times in self._arrays(user_ids).items()
+        }
+
+
+creation_times = CreationTimeIndex()
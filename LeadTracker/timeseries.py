@@ -0,0 +1,108 @@
+"""
+Lead count time series over arbitrary ranges, built on the rollup tables.
+
+bucket_series() reads the hourly, daily or monthly rollup rows for a range,
+lays them on a gap-filled axis of local bucket starts and returns NumPy
+arrays. lttb() downsamples such a series to a target number of points while
+keeping its visual shape (Largest-Triangle-Three-Buckets).
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.utils.timezone import make_aware
+
+from . import rollups
+from .models import DailyClientCount, HourlyClientCount, MonthlyClientCount
+
+HOUR = 3600
+
+# Bucket name -> (rollup model, bucket function, NumPy unit of the axis)
+BUCKETS = {
+    'hour': (HourlyClientCount, rollups.hour_bucket, 's'),
+    'day': (DailyClientCount, rollups.day_bucket, 'D'),
+    'month': (MonthlyClientCount, rollups.month_bucket, 'M'),
+}
+MAX_BUCKETS = 200000
+
+
+class SeriesTooLong(ValueError):
+    pass
+
+
+def _step(bucket):
+    return {
+        'hour': timedelta(hours=1),
+        'day': timedelta(days=1),
+        'month': relativedelta(months=1),
+    }[bucket]
+
+
+def _local_midnights(days):
+    """Epoch seconds of local midnight for an array of datetime64 days or months."""
+    return np.array(
+        [make_aware(datetime.combine(day, time.min)).timestamp() for day in days.astype('datetime64[D]').tolist()],
+        dtype=np.int64,
+    )
+
+
+def bucket_series(bucket, start, end, user_ids=None):
+    """
+    Return (t, v): bucket start times as epoch seconds and lead counts.
+
+    Every bucket from the one containing start to the one containing end is
+    present, with zero for buckets that have no rollup rows. Buckets follow
+    the local time zone, so days and months start at local midnight.
+    """
+    model, bucket_for, unit = BUCKETS[bucket]
+    first, last = bucket_for(start), bucket_for(end)
+
+    if bucket == 'hour':
+        axis = np.arange(int(first.timestamp()), int(last.timestamp()) + 1, HOUR, dtype=np.int64)
+    else:
+        axis = np.arange(np.datetime64(first, unit), np.datetime64(last, unit) + 1)
+    if len(axis) > MAX_BUCKETS:
+        raise SeriesTooLong(f'Range spans {len(axis)} {bucket} buckets; the limit is {MAX_BUCKETS}')
+
+    found = rollups.counts(model, first, last + _step(bucket), user_ids=user_ids)
+    values = np.zeros(len(axis), dtype=np.int64)
+    if found:
+        keys = list(found)
+        if bucket == 'hour':
+            positions = (np.array([key.timestamp() for key in keys], dtype=np.int64) - axis[0]) // HOUR
+        else:
+            positions = (np.array(keys, dtype=f'datetime64[{unit}]') - axis[0]).astype(np.int64)
+        np.add.at(values, positions, np.fromiter(found.values(), dtype=np.int64, count=len(keys)))
+
+    times = axis if bucket == 'hour' else _local_midnights(axis)
+    return times, values
+
+
+def lttb(x, y, threshold):
+    """
+    Downsample (x, y) to at most threshold points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. From each of the threshold - 2
+    inner bins it picks the point forming the largest triangle with the point
+    picked before and the average of the next bin.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    xf, yf = x.astype(np.float64), y.astype(np.float64)
+    bins = np.array_split(np.arange(1, n - 1), threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i, current in enumerate(bins):
+        following = bins[i + 1] if i + 1 < len(bins) else np.array([n - 1])
+        avg_x, avg_y = xf[following].mean(), yf[following].mean()
+        area = np.abs(
+            (xf[previous] - avg_x) * (yf[current] - yf[previous])
+            - (xf[previous] - xf[current]) * (avg_y - yf[previous])
+        )
+        previous = current[np.argmax(area)]
+        selected[i + 1] = previous
+    return x[selected], y[selected]
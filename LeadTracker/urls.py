@@ -11,9 +11,27 @@ urlpatterns = [
     path('edit/<int:customer_id>/', views.edit_customer, name='edit_customer'),
     path('delete-customer/<int:customer_id>/', views.delete_customer, name='delete_customer'),
     path('analytics/', views.analytics_view, name='analytics_view'),
+    path('search/', views.search_clients, name='search_clients'),
     path('api/records/', views.get_user_records, name='get_user_records'),
+    path('api/records/changes/', views.record_changes, name='record_changes'),
+    path('api/clients/bulk-delete/', views.bulk_delete_clients, name='bulk_delete_clients'),
+    path('api/clients/bulk-reassign/', views.bulk_reassign_clients, name='bulk_reassign_clients'),
+    path('api/clients/bulk/<str:token>/', views.bulk_clients_status, name='bulk_clients_status'),
+    path('api/field-stats/', views.field_stats, name='field_stats'),
+    path('api/lead-counts/', views.lead_counts, name='lead_counts'),
+    path('api/timeseries/', views.timeseries_data, name='timeseries_data'),
+    path('hourly-records-data/', views.hourly_records_data, name='hourly_records_data'),
+    path('daily-records-data/', views.daily_records_data, name='daily_records_data'),
+    path('monthly-records-data/', views.monthly_records_data, name='monthly_records_data'),
     path('create-field-template/', views.create_field_template, name='create_field_template'),
     path('export-to-excel/', views.export_to_excel, name='export_to_excel'),
+    path('export.csv', views.export_to_csv, name='export_to_csv'),
+    path('export.ndjson', views.export_to_ndjson, name='export_to_ndjson'),
+    path('exports/', views.create_export_job, name='create_export_job'),
+    path('exports/<int:job_id>/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:job_id>/download/', views.export_job_download, name='export_job_download'),
+    path('import/', views.import_leads_view, name='import_leads'),
+    path('import/<str:token>/', views.import_leads_status, name='import_leads_status'),
     path('create-client/', views.create_client_record, name='create_client_record'),
     path('customer/<int:customer_id>/', views.customer_detail, name='customer_detail'),
 ]
\ No newline at end of file
@@ -1,44 +1,43 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Client, ClientField, FieldTemplate, UserActivity
-from .forms import DynamicClientForm, ClientUpdateForm, CustomerEditForm
+from .models import TYPED_COLUMNS, ArchivedClient, Client, ClientField, DailyClientCount, ExportJob, FieldTemplate, HourlyClientCount, MonthlyClientCount
+from . import changes, dedup, jobs, rollups, search, timeseries
+from .analytics import analytics_summary, build_snapshot, field_statistics, load_snapshot, snapshot_age, store_snapshot
+from .forms import DynamicClientForm, ClientUpdateForm, CustomerEditForm, dynamic_field_values
+from .exports import CSV_CONTENT_TYPE, NDJSON_CONTENT_TYPE, XLSX_CONTENT_TYPE, iter_csv, iter_ndjson, write_xlsx
+from .grid import FIELD_PARAM_PREFIX, decode_cursor, encode_cursor, field_filters, filter_by_fields, paginate_clients, parse_page_size, pivot_rows, resolve_sort
+from .registry import field_templates as field_registry
+from .timeindex import creation_times
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect, JsonResponse, HttpResponse
+from django.core.exceptions import PermissionDenied
+from django.views.decorators.http import require_POST
+from django.http import Http404, HttpResponseRedirect, JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag, urlencode
 from Custom_user.models import User
-from django.db.models import Count, F
-from django.db.models.functions import TruncMonth, ExtractHour
-from django.utils.timezone import now
-from datetime import timedelta
+from django.db import transaction
+from django.conf import settings
+from django.utils.timezone import is_naive, localdate, make_aware, now
+from datetime import datetime, time, timedelta
+import hashlib
 import logging
 from django.utils.dateformat import DateFormat
 import json
 from Custom_user.forms import CustomUserCreationForm
-from openpyxl import Workbook
+import tempfile
 from dateutil.relativedelta import relativedelta  # Import for accurate month calculations
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-@login_required(login_url='/custom_user/login/')
-def update_user_activity(user):
-    try:
-        today = now().date()
-        user_activity, created = UserActivity.objects.get_or_create(user=user, date=today)
-
-        # Update record count
-        user_activity.record_count = Client.objects.filter(created_by=user, creation_date__date=today).count()
-
-        # Update active hours (ensure last_login is valid)
-        if hasattr(user, 'last_login') and user.last_login:
-            active_duration = now() - user.last_login
-            user_activity.active_hours = max(active_duration.total_seconds() / 3600, 0)  # Ensure non-negative hours
-        else:
-            user_activity.active_hours = 0  # Default to 0 if last_login is None or invalid
-
-        user_activity.save()
-    except Exception as e:
-        logger.error(f"Error updating user activity: {e}")
-        raise
+RECORDS_PAGE_SIZE = 100
+RECORDS_MAX_PAGE_SIZE = 1000
+TIMESERIES_DEFAULT_DAYS = 30
+TIMESERIES_MAX_POINTS = 2000
+# LTTB keeps both end points plus one per inner bin, so it needs at least 3
+TIMESERIES_MIN_POINTS = 3
+LEAD_COUNT_MAX_BINS = 366
 
 @login_required(login_url='/custom_user/login/')
 def dashboardView(request):
@@ -49,23 +48,54 @@ def dashboardView(request):
         else:
             clients = Client.objects.filter(created_by=request.user)
 
-        field_templates = FieldTemplate.objects.all()
+        field_templates = field_registry.all()
 
-        # Check if there are no clients or field templates
+        # Column filters: field.<Name>__icontains=value
         warning_message = None
-        if not clients.exists():
-            warning_message = "No clients found. Please add some records."
-        elif not field_templates.exists():
+        try:
+            filters = field_filters(request.GET)
+        except ValueError as e:
+            filters = []
+            warning_message = str(e)
+        clients = filter_by_fields(clients, filters)
+        filter_query = urlencode([
+            (key, value) for key, value in request.GET.items()
+            if key.startswith(FIELD_PARAM_PREFIX) and value
+        ])
+        filter_inputs = [
+            (field, f'{FIELD_PARAM_PREFIX}{field.name}__icontains', request.GET.get(f'{FIELD_PARAM_PREFIX}{field.name}__icontains', ''))
+            for field in field_templates
+        ]
+
+        # One keyset page of clients pivoted against the templates (bounded query count)
+        cursor = request.GET.get('cursor')
+        per_page = parse_page_size(request.GET.get('per_page'))
+        try:
+            page = paginate_clients(clients, field_templates, sort=request.GET.get('sort'), cursor=cursor, per_page=per_page)
+        except ValueError:
+            # A stale or tampered cursor starts over at the first page
+            cursor = None
+            page = paginate_clients(clients, field_templates, sort=request.GET.get('sort'), per_page=per_page)
+
+        # Check if there are no clients or field templates
+        if warning_message:
+            pass
+        elif not page.rows and not cursor:
+            warning_message = "No clients match the filters." if filters else "No clients found. Please add some records."
+        elif not field_templates:
             warning_message = "No field templates found. Please create field templates."
 
         return render(request, 'LeadTracker/dashboard.html', {
-            'clients': clients,
+            'rows': page.rows,
+            'page': page,
             'field_templates': field_templates,
+            'filter_inputs': filter_inputs,
+            'filter_query': filter_query,
             'warning_message': warning_message
         })
     except Exception as e:
         return render(request, 'LeadTracker/dashboard.html', {
-            'clients': [],
+            'rows': [],
             'field_templates': [],
             'error': f"An unexpected error occurred: {str(e)}"
         })
@@ -85,18 +115,29 @@ def create_system_user(request):
 @login_required(login_url='/custom_user/login/')
 def create_client_record(request):
     form = DynamicClientForm(request.POST or None)
+    duplicates = []
     if request.method == 'POST' and form.is_valid():
-        # Create Client with current user then save dynamic fields
-        client = Client.objects.create(created_by=request.user)
-        for field in FieldTemplate.objects.all():
-            value = form.cleaned_data.get(f'field_{field.id}', '')
-            ClientField.objects.update_or_create(
-                client=client,
-                template=field,
-                defaults={'value': value}
-            )
-        return redirect('dashboardView')
-    return render(request, 'LeadTracker/create-record.html', {'form': form})
+        values = dynamic_field_values(form.cleaned_data)
+
+        # Indexed lookup of existing clients with the same email, phone or name;
+        # the user has to confirm before a likely duplicate is saved
+        if not request.POST.get('confirm_duplicate'):
+            matches = dedup.find_matches(dedup.client_keys(values))
+            if matches:
+                clients = Client.objects.select_related('created_by').in_bulk(list(matches))
+                duplicates = [
+                    {'client': clients[client_id], 'kinds': kinds}
+                    for client_id, kinds in matches.items()
+                    if client_id in clients
+                ]
+
+        if not duplicates:
+            # Create Client with current user then save dynamic fields in one transaction
+            with transaction.atomic():
+                client = Client.objects.create(created_by=request.user)
+                ClientField.objects.upsert_values(client, values)
+            return redirect('dashboardView')
+    return render(request, 'LeadTracker/create-record.html', {'form': form, 'duplicates': duplicates})
 
 @login_required(login_url='/custom_user/login/')
 def update_record(request, record_id):
@@ -142,198 +183,566 @@ def analytics_view(request):
     if not request.user.is_superuser:
         return redirect('dashboardView')
 
-    # Fetch clients based on user type
-    clients = Client.objects.all()
-
-    employees = User.objects.all()
-    analytics_data = []
-
-    for employee in employees:
-        employee_clients = Client.objects.filter(created_by=employee)
-        last_client = employee_clients.order_by('-creation_date').first()
-
-        # Calculate daily record counts for the past 7 days
-        last_7_days = [now().date() - timedelta(days=i) for i in range(6, -1, -1)]
-        daily_counts_dict = {str(day): 0 for day in last_7_days}
-
-        raw_counts = (
-            employee_clients
-            .filter(creation_date__date__gte=now() - timedelta(days=7))
-            .values('creation_date__date')
-            .annotate(count=Count('id'))
-        )
-
-        for entry in raw_counts:
-            day_str = str(entry['creation_date__date'])
-            daily_counts_dict[day_str] = entry['count']
-
-        # Monthly data aggregation
-        monthly_counts = (
-            employee_clients
-            .annotate(month=TruncMonth('creation_date'))
-            .values('month')
-            .annotate(count=Count('id'))
-            .order_by('month')
-        )
-
-        monthly_counts_dict = {str(entry['month']): entry['count'] for entry in monthly_counts}
-
-        active_time = None
-        if employee.last_login:
-            active_time = now() - employee.last_login
-
-        analytics_data.append({
-            'employee': employee,
-            'total_records': employee_clients.count(),
-            'last_record': last_client,
-            'daily_counts': daily_counts_dict,
-            'monthly_counts': monthly_counts_dict,
-            'active_time': active_time,
-        })
+    # Serve the precomputed snapshot; once it is older than the staleness
+    # budget keep serving it while a background job rebuilds it
+    snapshot = load_snapshot()
+    if snapshot is None:
+        snapshot = store_snapshot(build_snapshot())
+    elif snapshot_age(snapshot) > getattr(settings, 'ANALYTICS_STALENESS_BUDGET', 300):
+        jobs.enqueue_analytics_refresh()
+
+    current_time = now()
+    analytics_data = snapshot['employees']
+    for data in analytics_data:
+        last_login = data['employee']['last_login']
+        data['active_time'] = current_time - last_login if last_login else None
 
     return render(request, 'LeadTracker/analytics.html', {
         'analytics_data': analytics_data,
-        'clients': clients
+        'summary': analytics_summary(analytics_data),
+        'generated_at': snapshot['generated_at'],
+        'typed_fields': [field for field in field_registry.all() if field.field_type in TYPED_COLUMNS],
     })
 
+def _parse_moment(value):
+    """Parse an ISO date or datetime query value into an aware datetime (None if invalid)."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None and (day := parse_date(value)) is not None:
+            moment = datetime.combine(day, time.min)
+    except ValueError:
+        return None
+    if moment is not None and is_naive(moment):
+        moment = make_aware(moment)
+    return moment
+
+def _conditional_json(request, payload, max_age=0):
+    """JsonResponse with a content ETag; answers 304 when If-None-Match matches."""
+    response = JsonResponse(payload)
+    response['ETag'] = quote_etag(hashlib.md5(response.content).hexdigest())
+    patch_cache_control(response, private=True, max_age=max_age)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+def _include_archived(params):
+    return params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
 @login_required(login_url='/custom_user/login/')
 def get_user_records(request):
+    owner = None
     if (username := request.GET.get('username')):
         try:
-            user = User.objects.get(username=username)
-            records = Client.objects.filter(created_by=user)
+            owner = User.objects.get(username=username)
         except User.DoesNotExist:
             return JsonResponse({'error': 'User not found'}, status=404)
-    else:
-        # Tüm kullanıcıların kayıtlarını döndür
-        records = Client.objects.all()
+
+    since_value = None
+    if (since := request.GET.get('since')):
+        since_value = _parse_moment(since)
+        if since_value is None:
+            return JsonResponse({'error': 'Invalid since value'}, status=400)
+
+    # Optional projection: ?fields=Name,City
+    templates = field_registry.all()
+    if (names := request.GET.get('fields')):
+        templates = []
+        for name in filter(None, (part.strip() for part in names.split(','))):
+            template = field_registry.by_name(name)
+            if template is None:
+                return JsonResponse({'error': f'Unknown field: {name}'}, status=400)
+            templates.append(template)
+
+    # Field filters (?field.City=Istanbul, ?field.Company__icontains=acme) and sort
+    # (creation_date by default, or e.g. -id, field:Company)
+    sort = request.GET.get('sort') or 'creation_date'
+    try:
+        filters = field_filters(request.GET)
+        resolve_sort(sort)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    def select(model):
+        records = model.objects.filter(created_by=owner) if owner else model.objects.all()
+        if since_value is not None:
+            records = records.filter(creation_date__gte=since_value)
+        return filter_by_fields(records, filters)
+
+    # Keyset pagination on (sort column, id). With ?include_archived=1 the
+    # archived clients follow the hot ones, under cursors tagged 'archived'.
+    include_archived = _include_archived(request.GET)
+    cursor = request.GET.get('cursor')
+    position = decode_cursor(cursor) if cursor else None
+    archived_phase = include_archived and position is not None and len(position) == 2 and position[0] == 'archived'
+    if cursor and not archived_phase and (position is None or len(position) != 3 or position[0] != 'next'):
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    limit = parse_page_size(request.GET.get('limit'), default=RECORDS_PAGE_SIZE, maximum=RECORDS_MAX_PAGE_SIZE)
+
+    try:
+        if archived_phase:
+            page = paginate_clients(select(ArchivedClient), templates, sort=sort, cursor=position[1], per_page=limit, default=None)
+            next_cursor = encode_cursor('archived', page.next_cursor) if page.next_cursor else None
+        else:
+            page = paginate_clients(select(Client), templates, sort=sort, cursor=cursor, per_page=limit, default=None)
+            next_cursor = page.next_cursor
+            if next_cursor is None and include_archived:
+                next_cursor = encode_cursor('archived', None)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
     data = {
         'records': [
             {
-                'id': record.id,
-                'created_by': record.created_by.username,
-                'creation_date': record.creation_date.strftime('%Y-%m-%d %H:%M:%S'),
+                'id': row['client'].id,
+                'created_by': row['client'].created_by.username,
+                'creation_date': row['client'].creation_date.strftime('%Y-%m-%d %H:%M:%S'),
+                'archived': archived_phase,
                 'details': [
                     {
-                        'field_name': field.template.name,
-                        'field_value': field.value
+                        'field_name': template.name,
+                        'field_value': value
                     }
-                    for field in record.fields.all()
+                    for template, value in zip(templates, row['values'])
+                    if value is not None
                 ]
             }
-            for record in records
-        ]
+            for row in page.rows
+        ],
+        'next_cursor': next_cursor,
     }
-    return JsonResponse(data)
+    return _conditional_json(request, data)
+
+@login_required(login_url='/custom_user/login/')
+def record_changes(request):
+    """Inserts, updates and deletes since ?cursor= (everything when omitted), oldest first."""
+    owner_id = None
+    if (username := request.GET.get('username')):
+        owner_id = User.objects.filter(username=username).values_list('id', flat=True).first()
+        if owner_id is None:
+            return JsonResponse({'error': 'User not found'}, status=404)
+
+    position = None
+    if (cursor := request.GET.get('cursor')):
+        try:
+            position = changes.decode_position(decode_cursor(cursor))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    limit = parse_page_size(request.GET.get('limit'), default=RECORDS_PAGE_SIZE, maximum=RECORDS_MAX_PAGE_SIZE)
+
+    batch = changes.changes_since(position, limit=limit, owner_id=owner_id)
+    templates = field_registry.all()
+    clients = [change for change in batch.changes if isinstance(change, Client)]
+    values = {row['client'].id: row['values'] for row in pivot_rows(clients, templates, default=None)}
+    # Clients created after the previous position are new to the caller
+    since = position[0] if position else None
+
+    data = []
+    for change in batch.changes:
+        if isinstance(change, Client):
+            data.append({
+                'op': 'insert' if since is None or change.creation_date > since else 'update',
+                'id': change.id,
+                'created_by': change.created_by.username,
+                'creation_date': change.creation_date.strftime('%Y-%m-%d %H:%M:%S'),
+                'updated_at': change.updated_at.isoformat(),
+                'details': [
+                    {'field_name': template.name, 'field_value': value}
+                    for template, value in zip(templates, values[change.id])
+                    if value is not None
+                ],
+            })
+        else:
+            data.append({
+                'op': 'delete',
+                'id': change.client_id,
+                'reason': change.reason,
+                'deleted_at': change.deleted_at.isoformat(),
+            })
+    return JsonResponse({
+        'changes': data,
+        'next_cursor': encode_cursor(*changes.encode_position(batch.position)),
+        'has_more': batch.has_more,
+    })
 
 @login_required(login_url='/custom_user/login/')
 def create_field_template(request):
     if request.method == 'POST':
         # Logic to handle form submission for creating field templates
         template_name = request.POST.get('template_name')
+        field_type = request.POST.get('field_type') or FieldTemplate.TYPE_TEXT
+        if field_type not in dict(FieldTemplate.TYPE_CHOICES):
+            return render(request, 'LeadTracker/create-field-template.html', {
+                'error': 'Unknown field type.',
+                'type_choices': FieldTemplate.TYPE_CHOICES,
+            })
         if template_name:
-            FieldTemplate.objects.create(name=template_name)
+            FieldTemplate.objects.create(name=template_name, field_type=field_type)
             return redirect('dashboardView')
         else:
             return render(request, 'LeadTracker/create-field-template.html', {
-                'error': 'Template name is required.'
+                'error': 'Template name is required.',
+                'type_choices': FieldTemplate.TYPE_CHOICES,
             })
-    return render(request, 'LeadTracker/create-field-template.html')
+    return render(request, 'LeadTracker/create-field-template.html', {'type_choices': FieldTemplate.TYPE_CHOICES})
 
 def index(request):
     return render(request, 'LeadTracker/index.html')
 
-def export_to_excel(request):
+def _export_queryset(request):
     # Get the selected employee's username from the query parameters
     username = request.GET.get('username')
+    # Same rule as create_export_job: only superusers export other users' (or all) records
+    if not request.user.is_superuser and username != request.user.username:
+        raise PermissionDenied
+    clients = jobs.export_queryset(username)
+    archived = jobs.export_queryset(username, ArchivedClient) if _include_archived(request.GET) else None
+    return username, clients, archived
 
-    # Excel çalışma kitabı 
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Detailed Records"
-
-    # Tablo başlıklarını ekle
-    headers = ["ID", "Created By", "Creation Date", "Details"]
-    worksheet.append(headers)
-
-    # Tablo verilerini ekle
-    clients = Client.objects.filter(created_by__username=username) if username else Client.objects.all()
-    for client in clients:
-        details = ", ".join([f"{field.template.name}: {field.value}" for field in client.fields.all()])
-        worksheet.append([
-            client.id,
-            client.created_by.username,
-            client.creation_date.strftime('%Y-%m-%d %H:%M:%S'),
-            details
-        ])
+def _export_filename(username, extension):
+    return f'{username}_Detailed_Records.{extension}' if username else f'Detailed_Records.{extension}'
 
-    # Excel dosyasını indirme 
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    response['Content-Disposition'] = f'attachment; filename={username}_Detailed_Records.xlsx' if username else 'attachment; filename=Detailed_Records.xlsx'
-    workbook.save(response)
+@login_required(login_url='/custom_user/login/')
+def export_to_excel(request):
+    username, clients, archived = _export_queryset(request)
+
+    # Write-only workbook spooled to a temp file, then streamed back in blocks
+    spool = tempfile.TemporaryFile()
+    write_xlsx(spool, clients, field_registry.all(), archived=archived)
+    spool.seek(0)
+
+    filename = _export_filename(username, 'xlsx')
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+@login_required(login_url='/custom_user/login/')
+def export_to_csv(request):
+    username, clients, archived = _export_queryset(request)
+    response = StreamingHttpResponse(iter_csv(clients, field_registry.all(), archived=archived), content_type=CSV_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename={_export_filename(username, "csv")}'
     return response
 
 @login_required(login_url='/custom_user/login/')
-def hourly_records_data(request):
-    # Calculate hourly record counts for the past 24 hours
-    last_24_hours = [now() - timedelta(hours=i) for i in range(23, -1, -1)]
-    hourly_counts = {hour.strftime('%Y-%m-%d %H:00'): 0 for hour in last_24_hours}
-
-    raw_counts = (
-        Client.objects.filter(creation_date__gte=now() - timedelta(hours=24))
-        .annotate(hour=F('creation_date__hour'))
-        .values('creation_date__date', 'hour')
-        .annotate(count=Count('id'))
-    )
+def export_to_ndjson(request):
+    username, clients, archived = _export_queryset(request)
+    response = StreamingHttpResponse(iter_ndjson(clients, field_registry.all(), archived=archived), content_type=NDJSON_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename={_export_filename(username, "ndjson")}'
+    return response
 
-    for entry in raw_counts:
-        hour_str = f"{entry['creation_date__date']} {entry['hour']:02}:00"
-        hourly_counts[hour_str] = entry['count']
+def _export_job_payload(job):
+    return {
+        'id': job.id,
+        'username': job.username,
+        'include_archived': job.include_archived,
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None,
+        'status_url': reverse('export_job_status', args=[job.id]),
+        'download_url': reverse('export_job_download', args=[job.id]) if job.status == ExportJob.STATUS_DONE else None,
+    }
+
+def _visible_export_job(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    if not request.user.is_superuser and job.requested_by_id != request.user.id:
+        raise Http404("Export job not found")
+    return job
+
+@require_POST
+@login_required(login_url='/custom_user/login/')
+def create_export_job(request):
+    username = request.POST.get('username', '')
+    if not request.user.is_superuser and username != request.user.username:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    job = jobs.enqueue_export(username, requested_by=request.user, include_archived=_include_archived(request.POST))
+    return JsonResponse(_export_job_payload(job), status=202 if job.status != ExportJob.STATUS_DONE else 200)
+
+@login_required(login_url='/custom_user/login/')
+def export_job_status(request, job_id):
+    return JsonResponse(_export_job_payload(_visible_export_job(request, job_id)))
+
+@login_required(login_url='/custom_user/login/')
+def export_job_download(request, job_id):
+    job = _visible_export_job(request, job_id)
+    if job.status != ExportJob.STATUS_DONE or not job.file:
+        return JsonResponse({'error': 'Export is not ready'}, status=409)
+    filename = _export_filename(job.username, 'xlsx')
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+@login_required(login_url='/custom_user/login/')
+def import_leads_view(request):
+    if not request.user.is_superuser:
+        return redirect('dashboardView')
+
+    error = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        owner = User.objects.filter(username=request.POST.get('owner')).first() or request.user
+        if not upload:
+            error = 'Please choose a CSV or XLSX file.'
+        elif not upload.name.lower().endswith(('.csv', '.xlsx')):
+            error = 'Only CSV and XLSX files can be imported.'
+        else:
+            token = jobs.enqueue_import(upload, owner)
+            return redirect(f"{reverse('import_leads')}?token={token}")
+
+    return render(request, 'LeadTracker/import-leads.html', {
+        'error': error,
+        'token': request.GET.get('token', ''),
+        'users': User.objects.order_by('username').values_list('username', flat=True),
+    })
+
+@login_required(login_url='/custom_user/login/')
+def import_leads_status(request, token):
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    progress = jobs.import_progress(token)
+    if progress is None:
+        return JsonResponse({'error': 'Import not found'}, status=404)
+    return JsonResponse(progress)
+
+def _bulk_selection(request):
+    """(client ids or None, owner id or None) from the ids and owner POST parameters."""
+    raw_ids = [part for value in request.POST.getlist('ids') for part in value.split(',') if part.strip()]
+    try:
+        client_ids = [int(part) for part in raw_ids] if raw_ids else None
+    except ValueError:
+        raise ValueError('ids must be integers')
+    owner_id = None
+    if request.POST.get('owner'):
+        owner_id = User.objects.filter(username=request.POST['owner']).values_list('id', flat=True).first()
+        if owner_id is None:
+            raise ValueError(f"User '{request.POST['owner']}' does not exist")
+    if client_ids is None and owner_id is None:
+        raise ValueError('Select clients with ids and/or owner')
+    return client_ids, owner_id
+
+def _bulk_job_response(token):
+    return JsonResponse({'token': token, 'status_url': reverse('bulk_clients_status', args=[token])}, status=202)
+
+@require_POST
+@login_required(login_url='/custom_user/login/')
+def bulk_delete_clients(request):
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    try:
+        client_ids, owner_id = _bulk_selection(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return _bulk_job_response(jobs.enqueue_bulk('delete', client_ids, owner_id))
+
+@require_POST
+@login_required(login_url='/custom_user/login/')
+def bulk_reassign_clients(request):
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    try:
+        client_ids, owner_id = _bulk_selection(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    new_owner = User.objects.filter(username=request.POST.get('to', '')).first()
+    if new_owner is None:
+        return JsonResponse({'error': 'to must name an existing user'}, status=400)
+    return _bulk_job_response(jobs.enqueue_bulk('reassign', client_ids, owner_id, new_owner.id))
+
+@login_required(login_url='/custom_user/login/')
+def bulk_clients_status(request, token):
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    progress = jobs.bulk_progress(token)
+    if progress is None:
+        return JsonResponse({'error': 'Bulk job not found'}, status=404)
+    return JsonResponse(progress)
+
+@login_required(login_url='/custom_user/login/')
+def hourly_records_data(request):
+    # Hourly record counts for the past 24 hours; closed hours come from the cache
+    current_hour = rollups.hour_bucket(now())
+    last_24_hours = [current_hour - timedelta(hours=i) for i in range(23, -1, -1)]
+    raw_counts = rollups.cached_totals(HourlyClientCount, last_24_hours)
+
+    hourly_counts = {
+        hour.strftime('%Y-%m-%d %H:00'): raw_counts[hour]
+        for hour in last_24_hours
+    }
 
     logger.debug(f"Hourly Counts: {hourly_counts}")
-    return JsonResponse({'hourly_counts': hourly_counts})
+    # The chart polls every few seconds; an ETag turns unchanged polls into 304s
+    return _conditional_json(request, {'hourly_counts': hourly_counts})
 
 @login_required(login_url='/custom_user/login/')
 def daily_records_data(request):
-    # Calculate daily record counts for the past 7 days
-    last_7_days = [now().date() - timedelta(days=i) for i in range(6, -1, -1)]
-    daily_counts = {str(day): 0 for day in last_7_days}
-
-    raw_counts = (
-        Client.objects.filter(creation_date__date__gte=now() - timedelta(days=7))
-        .values('creation_date__date')
-        .annotate(count=Count('id'))
-    )
+    # Daily record counts for the past 7 days
+    last_7_days = [localdate() - timedelta(days=i) for i in range(6, -1, -1)]
+    raw_counts = rollups.cached_totals(DailyClientCount, last_7_days)
 
-    for entry in raw_counts:
-        day_str = str(entry['creation_date__date'])
-        daily_counts[day_str] = entry['count']
+    daily_counts = {str(day): raw_counts[day] for day in last_7_days}
 
     logger.debug(f"Daily Counts: {daily_counts}")
-    return JsonResponse({'daily_counts': daily_counts})
+    return _conditional_json(request, {'daily_counts': daily_counts}, max_age=60)
 
 @login_required(login_url='/custom_user/login/')
 def monthly_records_data(request):
-    # Calculate monthly record counts for the past year
-    last_12_months = [(now().date().replace(day=1) - relativedelta(months=i)) for i in range(11, -1, -1)]
-    monthly_counts = {month.strftime('%Y-%m'): 0 for month in last_12_months}
-
-    raw_counts = (
-        Client.objects.annotate(month=TruncMonth('creation_date'))
-        .values('month')
-        .annotate(count=Count('id'))
-        .order_by('month')
-    )
+    # Monthly record counts for the past year
+    last_12_months = [(localdate().replace(day=1) - relativedelta(months=i)) for i in range(11, -1, -1)]
+    raw_counts = rollups.cached_totals(MonthlyClientCount, last_12_months)
 
-    for entry in raw_counts:
-        month_str = str(entry['month'])
-        monthly_counts[month_str] = entry['count']
+    monthly_counts = {month.strftime('%Y-%m'): raw_counts[month] for month in last_12_months}
 
     logger.debug(f"Monthly Counts: {monthly_counts}")
-    return JsonResponse({'monthly_counts': monthly_counts})
+    return _conditional_json(request, {'monthly_counts': monthly_counts}, max_age=300)
+
+@login_required(login_url='/custom_user/login/')
+def timeseries_data(request):
+    """
+    Lead counts per bucket for an arbitrary range as compact arrays.
+
+    Query parameters: from/to (ISO date or datetime, default the last 30
+    days), bucket (hour, day or month), user (username) and max_points.
+    Longer series are downsampled with LTTB; "total" is always the exact sum.
+    """
+    bucket = request.GET.get('bucket', 'day')
+    if bucket not in timeseries.BUCKETS:
+        return JsonResponse({'error': 'bucket must be one of: ' + ', '.join(timeseries.BUCKETS)}, status=400)
+
+    end = _parse_moment(request.GET['to']) if request.GET.get('to') else now()
+    start = _parse_moment(request.GET['from']) if request.GET.get('from') else end - timedelta(days=TIMESERIES_DEFAULT_DAYS)
+    if start is None or end is None or start > end:
+        return JsonResponse({'error': 'Invalid from/to range'}, status=400)
+
+    user_ids = None
+    if (username := request.GET.get('user')):
+        user_ids = list(User.objects.filter(username=username).values_list('id', flat=True))
+        if not user_ids:
+            return JsonResponse({'error': 'User not found'}, status=404)
+
+    max_points = max(
+        parse_page_size(request.GET.get('max_points'), default=TIMESERIES_MAX_POINTS, maximum=TIMESERIES_MAX_POINTS),
+        TIMESERIES_MIN_POINTS,
+    )
+    try:
+        times, values = timeseries.bucket_series(bucket, start, end, user_ids=user_ids)
+    except timeseries.SeriesTooLong as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    t, v = timeseries.lttb(times, values, max_points)
+
+    return _conditional_json(request, {
+        'bucket': bucket,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'total': int(values.sum()),
+        'points': len(times),
+        'downsampled': len(t) < len(times),
+        't': t.tolist(),
+        'v': v.tolist(),
+    }, max_age=60)
+
+@login_required(login_url='/custom_user/login/')
+def lead_counts(request):
+    """
+    Per-employee lead counts for a custom range, answered from the in-memory index.
+
+    Query parameters: from/to (ISO date or datetime, default the last 7
+    days), users (comma separated usernames, default everyone) and bins
+    (optional number of equal-width histogram bins).
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    end = _parse_moment(request.GET['to']) if request.GET.get('to') else now()
+    start = _parse_moment(request.GET['from']) if request.GET.get('from') else end - timedelta(days=7)
+    if start is None or end is None or start > end:
+        return JsonResponse({'error': 'Invalid from/to range'}, status=400)
+
+    users = User.objects.order_by('id')
+    if (usernames := request.GET.get('users')):
+        users = users.filter(username__in=[name.strip() for name in usernames.split(',')])
+    names = dict(users.values_list('id', 'username'))
+
+    payload = {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'counts': {names[user_id]: count for user_id, count in creation_times.counts(start, end, names).items()},
+    }
+    if request.GET.get('bins'):
+        bins = parse_page_size(request.GET['bins'], default=LEAD_COUNT_MAX_BINS, maximum=LEAD_COUNT_MAX_BINS)
+        step = (end - start) / bins
+        edges = [start + step * i for i in range(bins)] + [end]
+        payload['edges'] = [int(edge.timestamp()) for edge in edges]
+        payload['histogram'] = {
+            names[user_id]: counts.tolist()
+            for user_id, counts in creation_times.histogram(edges, names).items()
+        }
+    return JsonResponse(payload)
+
+@login_required(login_url='/custom_user/login/')
+def search_clients(request):
+    """
+    Ranked full-text search over field values: ?q=<words>&limit=<n>.
+
+    Every word must match (as a prefix). Non-superusers only see their own
+    clients, as on the dashboard. Highlights are HTML-escaped with the
+    matches wrapped in <mark>.
+    """
+    query = request.GET.get('q', '')
+    limit = parse_page_size(request.GET.get('limit'), default=search.DEFAULT_LIMIT, maximum=search.MAX_LIMIT)
+    owner = None if request.user.is_superuser else request.user
+
+    hits = search.search_clients(query, owner=owner, limit=limit)
+    clients = Client.objects.select_related('created_by').in_bulk([hit['client_id'] for hit in hits])
+    results = []
+    for hit in hits:
+        client = clients.get(hit['client_id'])
+        if client is None:
+            continue
+        results.append({
+            'id': client.id,
+            'created_by': client.created_by.username,
+            'creation_date': client.creation_date.strftime('%Y-%m-%d %H:%M:%S'),
+            # Same page the dashboard links to; customer_detail only serves the user's own clients
+            'url': reverse('view_customer', args=[client.id]),
+            'score': hit['score'],
+            'matches': [
+                {
+                    'field_name': template.name if (template := field_registry.get(template_id)) else None,
+                    'highlight': highlight,
+                }
+                for template_id, highlight in hit['matches']
+            ],
+        })
+    return JsonResponse({'query': query, 'results': results})
+
+@login_required(login_url='/custom_user/login/')
+def field_stats(request):
+    """
+    Per-employee aggregates of a typed field: ?field=<Name>[&from=&to=&user=].
+
+    from/to restrict by client creation date. Numbers report count, sum,
+    avg, min and max; dates count, min and max; yes/no fields count, yes
+    and no.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    template = field_registry.by_name(request.GET.get('field', ''))
+    if template is None:
+        return JsonResponse({'error': 'Unknown field'}, status=400)
+    if template.field_type not in TYPED_COLUMNS:
+        return JsonResponse({'error': f'{template.name} is a text field'}, status=400)
+
+    start = end = None
+    if request.GET.get('from') and (start := _parse_moment(request.GET['from'])) is None:
+        return JsonResponse({'error': 'Invalid from value'}, status=400)
+    if request.GET.get('to') and (end := _parse_moment(request.GET['to'])) is None:
+        return JsonResponse({'error': 'Invalid to value'}, status=400)
+
+    users = User.objects.order_by('id')
+    if (username := request.GET.get('user')):
+        users = users.filter(username=username)
+    names = dict(users.values_list('id', 'username'))
+
+    stats = field_statistics(template, user_ids=list(names), start=start, end=end)
+    return JsonResponse({
+        'field': template.name,
+        'field_type': template.field_type,
+        'employees': {names[user_id]: entry for user_id, entry in stats.items()},
+    })
 
 from .models import ClientField, FieldTemplate
 
@@ -341,30 +750,22 @@ def save_client_fields(client, cleaned_data):
     """
     Helper function to save or update client fields based on the provided cleaned data.
     """
-    for field in FieldTemplate.objects.all():
-        value = cleaned_data.get(f'field_{field.id}', '')
-        client_field, _ = ClientField.objects.get_or_create(client=client, template=field)
-        client_field.value = value
-        client_field.save()
+    values = {
+        template_id: cleaned_data.get(f'field_{template_id}', '')
+        for template_id in field_registry.ids()
+    }
+    ClientField.objects.upsert_values(client, values)
 
 @login_required(login_url='/custom_user/login/')
 def customer_detail(request, customer_id):
     # Ensure customer exists and belongs to the user
-    customer = get_object_or_404(Client, id=customer_id, created_by=request.user)
-
-    # Get templates once and as a list to preserve order
-    field_templates = list(FieldTemplate.objects.all())
+    customer = get_object_or_404(Client.objects.select_related('created_by'), id=customer_id, created_by=request.user)
 
-    # Prefetch fields for the single client to avoid N+1
-    clients_qs = Client.objects.filter(id=customer_id).prefetch_related('fields__template')
+    # Templates come from the process-local registry, already ordered
+    field_templates = field_registry.all()
 
     # Build rows: each row contains client and ordered values matching field_templates
-    rows = []
-    for client in clients_qs:
-        # map template id -> value
-        mapping = {cf.template_id: cf.value for cf in client.fields.all()}
-        values = [mapping.get(ft.id, '-') for ft in field_templates]
-        rows.append({'client': client, 'values': values})
+    rows = pivot_rows([customer], field_templates, default='-')
 
     return render(request, 'LeadTracker/customer_detail.html', {
         'rows': rows,
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_remove_room_created_by_remove_room_members_chatroom_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'is_read', 'sender'], name='chatmessage_room_unread'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'timestamp'], name='chatmessage_room_timestamp'),
+        ),
+    ]
@@ -31,3 +31,9 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Unread counts per room and sender
+            models.Index(fields=['room', 'is_read', 'sender'], name='chatmessage_room_unread'),
+            # Room history in timestamp order
+            models.Index(fields=['room', 'timestamp'], name='chatmessage_room_timestamp'),
+        ]
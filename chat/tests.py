@@ -1,3 +1,46 @@
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from Custom_user.models import User
+from LeadTracker.tests import QueryPlanAssertions
+
+from .models import ChatMessage, ChatRoom
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class ChatPlanTests(QueryPlanAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='pw')
+        cls.other = User.objects.create_user(username='writer', email='writer@example.com', password='pw')
+        cls.room = ChatRoom.objects.create(name=f'private_{cls.user.id}_{cls.other.id}', created_by=cls.user)
+        cls.room.members.add(cls.user, cls.other)
+
+    def test_private_room_by_name(self):
+        self.assertSearches(ChatRoom.objects.filter(name=self.room.name), 'chat_chatroom')
+
+    def test_unread_count_per_sender(self):
+        unread = ChatMessage.objects.filter(
+            room__name=self.room.name,
+            room__members=self.user,
+            sender=self.other,
+            is_read=False,
+        )
+        self.assertSearches(unread, 'chat_chatmessage')
+
+    def test_unread_in_room(self):
+        unread = ChatMessage.objects.filter(room=self.room, is_read=False).exclude(sender=self.user)
+        self.assertSearches(unread, 'chat_chatmessage')
+
+    def test_room_history(self):
+        self.assertSearches(ChatMessage.objects.filter(room=self.room).order_by('timestamp'), 'chat_chatmessage')
+
+    def test_new_messages_since(self):
+        self.assertSearches(ChatMessage.objects.filter(room=self.room, id__gt=10)[:50], 'chat_chatmessage')
+
+    def test_notifications(self):
+        rooms = ChatRoom.objects.filter(members=self.user)
+        unread = ChatMessage.objects.filter(room__in=rooms, is_read=False).exclude(sender=self.user).order_by('-timestamp')
+        self.assertSearches(unread, 'chat_chatmessage')